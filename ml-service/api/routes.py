@@ -1,10 +1,20 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 from datetime import datetime
 from ..services.model_training import ModelTrainingService
 from ..services.inference import InferenceService
 from ..services.feature_extraction import FeatureExtractionService
+from ..services.factorization import FACTORIZERS
+from ..services.training_executor import TrainingExecutor
+from ..services.fold_in import FoldInService
+from ..services.model_registry import model_registry
+from ..services.db_pool import pool_registry
+from ..services.feature_cache import feature_cache
+from ..services.redis_cache import redis_feature_cache
+from ..services.engagement_counters import engagement_counters
+from ..services.engagement_tail import engagement_tail
+from ..services.trending import trending_detector
 
 router = APIRouter()
 
@@ -25,12 +35,19 @@ class RecommendationRequest(BaseModel):
 
 class TrainingRequest(BaseModel):
     force_retrain: Optional[bool] = False
+    engine: Optional[str] = None
 
 # Initialize services
 model_training = ModelTrainingService()
 inference_service = InferenceService()
 feature_extractor = FeatureExtractionService()
 
+# Freshly trained models are hot-swapped into the shared registry
+training_executor = TrainingExecutor(on_model_ready=model_registry.load_version)
+
+# New users and posts get CF factors between retrains
+fold_in_service = FoldInService(executor=training_executor)
+
 @router.post("/rank", response_model=List[RankingResponse])
 async def rank_posts(request: RankingRequest):
     """Rank posts for a specific user"""
@@ -61,13 +78,16 @@ async def get_recommendations(request: RecommendationRequest):
         raise HTTPException(status_code=500, detail=f"Recommendation failed: {str(e)}")
 
 @router.post("/train")
-async def train_model(request: TrainingRequest, background_tasks: BackgroundTasks):
+async def train_model(request: TrainingRequest):
     """Train or retrain the recommendation model"""
+    if request.engine and request.engine not in FACTORIZERS:
+        raise HTTPException(status_code=400, detail=f"Unknown engine: {request.engine}")
+    
     try:
         if request.force_retrain or not model_training.model:
-            # Run training in background
-            background_tasks.add_task(model_training.train_recommendation_model)
-            return {"message": "Model training started", "status": "training"}
+            # Run training in a worker process
+            job = training_executor.submit(request.engine)
+            return {"message": "Model training started", "status": "training", "job_id": job['job_id']}
         else:
             return {"message": "Model already trained", "status": "ready"}
             
@@ -79,7 +99,7 @@ async def get_model_status():
     """Get current model status and information"""
     try:
         model_info = model_training.get_model_info()
-        return model_info
+        return {**model_info, 'fold_in': fold_in_service.get_info()}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Status check failed: {str(e)}")
@@ -124,16 +144,54 @@ async def get_interaction_features(user_id: str, post_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Feature extraction failed: {str(e)}")
 
+@router.get("/train/{job_id}")
+async def get_training_job(job_id: str):
+    """Get status and progress of a training job"""
+    job = training_executor.get_job(job_id)
+    
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Training job {job_id} not found")
+    
+    return job
+
 @router.post("/retrain")
-async def retrain_model(background_tasks: BackgroundTasks):
+async def retrain_model():
     """Force retrain the model with latest data"""
     try:
-        background_tasks.add_task(model_training.retrain_model)
-        return {"message": "Model retraining started", "status": "retraining"}
+        job = training_executor.submit()
+        return {"message": "Model retraining started", "status": "retraining", "job_id": job['job_id']}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Retraining failed: {str(e)}")
 
+@router.post("/model/fold-in")
+async def fold_in_new_entities():
+    """Fold users and posts seen since the last retrain into the serving model now"""
+    return await fold_in_service.fold_in(force=True)
+
+@router.get("/metrics/db")
+async def get_db_metrics():
+    """Get connection pool and query latency metrics per workload"""
+    return pool_registry.get_metrics()
+
+@router.get("/metrics/cache")
+async def get_cache_metrics():
+    """Get size, hit/miss and eviction counters of the in-process and Redis feature caches"""
+    return {
+        "local": feature_cache.get_info(),
+        "redis": redis_feature_cache.get_info()
+    }
+
+@router.get("/metrics/engagement")
+async def get_engagement_metrics():
+    """Get ingestion and reconciliation state of the engagement counters and the table tail feeding them"""
+    return {**engagement_counters.get_info(), 'tail': engagement_tail.get_info()}
+
+@router.get("/metrics/trending")
+async def get_trending_metrics():
+    """Get window size, warm-up state and database fallbacks of the trending detector"""
+    return trending_detector.get_info()
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
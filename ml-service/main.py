@@ -2,18 +2,32 @@ from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from contextlib import asynccontextmanager
-from .services.model_training import ModelTrainingService
+from .services.model_registry import model_registry
+from .services.db_pool import pool_registry
+from .services.redis_cache import redis_feature_cache
+from .services.engagement_counters import engagement_counters
+from .services.engagement_tail import engagement_tail
 from .services.feature_extraction import FeatureExtractionService
 from .services.inference import InferenceService
-from .api.routes import router
+from .api.routes import router, training_executor, fold_in_service
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    await ModelTrainingService.initialize()
+    # Startup: load the serving model before accepting requests
+    await model_registry.load_latest()
+    model_registry.start_polling()
+    fold_in_service.start()
+    engagement_counters.start()
+    engagement_tail.start()
     yield
     # Shutdown
-    pass
+    await engagement_tail.stop()
+    await engagement_counters.stop()
+    await fold_in_service.stop()
+    await model_registry.stop_polling()
+    training_executor.shutdown()
+    await pool_registry.close()
+    await redis_feature_cache.close()
 
 app = FastAPI(
     title="ML Recommendation Service",
@@ -0,0 +1,103 @@
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+# Rows assigned to centroids per step while clustering, to bound memory
+ASSIGN_BLOCK_ROWS = 65536
+
+def build_ivf_index(vectors: np.ndarray, n_lists: Optional[int] = None, iterations: int = 10,
+                    random_state: int = 42) -> Dict[str, np.ndarray]:
+    """Cluster item vectors with k-means into inverted lists for approximate inner-product search"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n_rows = vectors.shape[0] if vectors.ndim == 2 else 0
+
+    if n_rows == 0:
+        return empty_ivf_index()
+
+    # ~sqrt(n) lists keeps both the centroid scan and each probed list short
+    n_lists = min(n_lists or int(np.sqrt(n_rows)), n_rows)
+    n_lists = max(n_lists, 1)
+
+    rng = np.random.default_rng(random_state)
+    centroids = vectors[rng.choice(n_rows, n_lists, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = _assign(vectors, centroids)
+        counts = np.bincount(assignments, minlength=n_lists)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+
+        # Empty lists are re-seeded from random items instead of being dropped
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        centroids[empty] = vectors[rng.choice(n_rows, int(empty.sum()), replace=False)]
+
+    return _lists_from_assignments(centroids, _assign(vectors, centroids), np.arange(n_rows))
+
+def add_to_ivf_index(index: Dict[str, np.ndarray], vectors: np.ndarray, first_row: int) -> Dict[str, np.ndarray]:
+    """Copy of the index with new vectors (rows first_row...) filed under their nearest existing lists"""
+    centroids = index['centroids']
+    vectors = np.asarray(vectors, dtype=np.float32)
+
+    if len(centroids) == 0 or len(vectors) == 0:
+        return index
+
+    rows = np.concatenate([index['list_rows'], np.arange(first_row, first_row + len(vectors), dtype=np.int32)])
+    lists = np.concatenate([
+        np.repeat(np.arange(len(centroids)), np.diff(index['list_offsets'])),
+        _assign(vectors, centroids)
+    ])
+
+    return _lists_from_assignments(centroids, lists, rows)
+
+def search_ivf_index(index: Dict[str, np.ndarray], vectors: np.ndarray, query: np.ndarray,
+                     k: int, n_probe: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+    """Rows of `vectors` with the highest inner product with `query` among the n_probe closest lists, best first"""
+    centroids = index['centroids']
+
+    if len(centroids) == 0 or k <= 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+    query = np.asarray(query, dtype=np.float32)
+    n_probe = min(n_probe, len(centroids))
+    probed = np.argpartition(-(centroids @ query), n_probe - 1)[:n_probe]
+
+    offsets = index['list_offsets']
+    candidates = np.concatenate([index['list_rows'][offsets[i]:offsets[i + 1]] for i in probed]).astype(np.int64)
+
+    if len(candidates) == 0:
+        return candidates, np.array([], dtype=np.float32)
+
+    scores = np.asarray(vectors[candidates], dtype=np.float32) @ query
+    k = min(k, len(candidates))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+
+    return candidates[top], scores[top]
+
+def empty_ivf_index() -> Dict[str, np.ndarray]:
+    return {
+        'centroids': np.zeros((0, 0), dtype=np.float32),
+        'list_offsets': np.zeros(1, dtype=np.int64),
+        'list_rows': np.zeros(0, dtype=np.int32)
+    }
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Nearest centroid (L2) for every vector"""
+    half_norms = 0.5 * np.einsum('ij,ij->i', centroids, centroids)
+    assignments = np.empty(len(vectors), dtype=np.int64)
+
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = vectors[start:start + ASSIGN_BLOCK_ROWS]
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T - half_norms, axis=1)
+
+    return assignments
+
+def _lists_from_assignments(centroids: np.ndarray, lists: np.ndarray, rows: np.ndarray) -> Dict[str, np.ndarray]:
+    order = np.argsort(lists, kind='stable')
+    counts = np.bincount(lists, minlength=len(centroids))
+
+    return {
+        'centroids': centroids.astype(np.float32),
+        'list_offsets': np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+        'list_rows': rows[order].astype(np.int32)
+    }
@@ -0,0 +1,70 @@
+import threading
+import numpy as np
+from sklearn.neighbors import KDTree
+from typing import Dict, List, Optional, Sequence
+
+class ContentIndex:
+    """KD-tree over the content model's standardized post features, queried by raw feature values.
+
+    The tree (a float64 copy of the features) is only built by the first query, so workers that
+    never see a cold post keep just the memory-mapped features.
+    """
+
+    def __init__(self, features: np.ndarray, post_ids: Sequence[str], feature_columns: Sequence[str],
+                 feature_mean: np.ndarray, feature_scale: np.ndarray, leaf_size: int = 40):
+        self.post_ids = list(post_ids)
+        self.feature_columns = list(feature_columns)
+        self.feature_mean = np.asarray(feature_mean, dtype=np.float64)
+        self.feature_scale = np.asarray(feature_scale, dtype=np.float64)
+        self.features = features
+        self.leaf_size = leaf_size
+        self.tree: Optional[KDTree] = None
+        self._build_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.post_ids)
+
+    @property
+    def is_built(self) -> bool:
+        return self.tree is not None
+
+    def build(self) -> KDTree:
+        """Build the KD-tree once; concurrent callers wait for the first build"""
+        with self._build_lock:
+            if self.tree is None:
+                self.tree = KDTree(np.asarray(self.features, dtype=np.float64), leaf_size=self.leaf_size)
+        return self.tree
+
+    def vectorize(self, post_features: Dict) -> np.ndarray:
+        """Standardize a feature dict the same way the content model was trained"""
+        values = np.array([float(post_features.get(column) or 0) for column in self.feature_columns])
+        return (values - self.feature_mean) / self.feature_scale
+
+    def query(self, post_features: Dict, k: int = 10) -> List[str]:
+        """IDs of the k posts nearest in feature space, excluding the queried post itself"""
+        if not self.post_ids:
+            return []
+
+        # One extra in case the post is itself in the index
+        _, rows = self.build().query(self.vectorize(post_features)[None, :], k=min(k + 1, len(self.post_ids)))
+
+        post_id = post_features.get('post_id')
+        return [self.post_ids[row] for row in rows[0] if self.post_ids[row] != post_id][:k]
+
+def build_content_index(content_model: Dict):
+    """ContentIndex for a content model dict, or None when it has no features or scaling statistics"""
+    features = content_model.get('features')
+
+    if features is None or np.size(features) == 0 or not content_model.get('feature_columns'):
+        return None
+    # Without them raw features cannot be standardized; cold posts then fall back to neighbour lists
+    if content_model.get('feature_mean') is None or content_model.get('feature_scale') is None:
+        return None
+
+    return ContentIndex(
+        features,
+        content_model['post_ids'],
+        content_model['feature_columns'],
+        content_model['feature_mean'],
+        content_model['feature_scale']
+    )
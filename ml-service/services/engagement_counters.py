@@ -0,0 +1,205 @@
+import os
+import time
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from .database import DatabaseService, ENGAGEMENT_TYPES
+
+# Count names in ENGAGEMENT_TYPES order, as returned by get_posts_engagement_data
+COUNT_NAMES = ['views', 'likes', 'comments', 'shares']
+_TYPE_INDEX = {engagement_type: i for i, engagement_type in enumerate(ENGAGEMENT_TYPES)}
+
+class EngagementCounters:
+    """Per-post engagement counts kept current from ingested events and reconciled with the database.
+
+    Events come from the engagement table tail each worker runs, so the counters of every worker
+    follow the same stream. Counts are only served while that stream is current, or for ttl_seconds
+    after they were loaded from the database if it is not.
+    """
+
+    def __init__(self, db: Optional[DatabaseService] = None):
+        self.db = db if db is not None else DatabaseService()
+        self.reconcile_interval = float(os.getenv('ENGAGEMENT_RECONCILE_INTERVAL_SECONDS', '300'))
+        # Posts neither read nor engaged with for this long stop being tracked
+        self.idle_seconds = float(os.getenv('ENGAGEMENT_COUNTER_IDLE_SECONDS', '86400'))
+        # How long loaded counts are served when no tail is feeding events
+        self.ttl_seconds = float(os.getenv('ENGAGEMENT_COUNTER_TTL_SECONDS', '60'))
+        # The tail counts as current if it reported within this many seconds
+        self.max_tail_delay = float(os.getenv('ENGAGEMENT_TAIL_MAX_DELAY_SECONDS', '30'))
+        self.reconcile_batch_size = 1000
+        # All-time counts, only for posts whose baseline was loaded from the database
+        self._totals: Dict[str, List[int]] = {}
+        self._last_used: Dict[str, float] = {}
+        self._seeded_at: Dict[str, float] = {}
+        # Every engagement up to this timestamp has been ingested, as reported by the tail
+        self.through: Optional[datetime] = None
+        self._tail_reported_at: Optional[float] = None
+        # Database fetches in flight: their cutoff and the events for their posts ingested after it
+        self._inflight: List[Tuple[Optional[datetime], Dict[str, List[int]]]] = []
+        self.events_ingested = 0
+        self.events_rejected = 0
+        self.last_reconcile: Optional[Dict] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __contains__(self, post_id: str) -> bool:
+        return post_id in self._totals
+
+    def ingest(self, events: Iterable[Dict], through: Optional[datetime] = None) -> int:
+        """Apply engagement events to the counters, returning how many were accepted.
+
+        `through` marks that every engagement up to that time has now been ingested.
+        """
+        now = time.time()
+        accepted = 0
+
+        for event in events:
+            type_index = _TYPE_INDEX.get(event.get('engagement_type'))
+            if type_index is None or not event.get('post_id'):
+                self.events_rejected += 1
+                continue
+
+            post_id = str(event['post_id'])
+            timestamp = event.get('timestamp')
+
+            # Posts without a database baseline pick these events up when they are first read
+            if post_id in self._totals:
+                self._totals[post_id][type_index] += 1
+                self._last_used[post_id] = now
+
+            # Events past a fetch's cutoff are not in the counts it will return
+            for cutoff, pending in self._inflight:
+                if post_id in pending and (cutoff is None or not isinstance(timestamp, datetime) or timestamp > cutoff):
+                    pending[post_id][type_index] += 1
+
+            accepted += 1
+
+        if through is not None:
+            self.through = through
+            self._tail_reported_at = now
+
+        self.events_ingested += accepted
+        return accepted
+
+    def is_tail_current(self) -> bool:
+        return self._tail_reported_at is not None and time.time() - self._tail_reported_at <= self.max_tail_delay
+
+    def get_counts(self, post_ids: Iterable[str]) -> Dict[str, Dict[str, int]]:
+        """All-time counts for the tracked posts among post_ids that are not stale"""
+        now = time.time()
+        tail_current = self.is_tail_current()
+        counts = {}
+
+        for post_id in post_ids:
+            totals = self._totals.get(post_id)
+            if totals is not None and (tail_current or now - self._seeded_at[post_id] < self.ttl_seconds):
+                counts[post_id] = dict(zip(COUNT_NAMES, totals))
+                self._last_used[post_id] = now
+
+        return counts
+
+    def seed(self, counts: Dict[str, Dict[str, int]]):
+        """Set the all-time counts of posts from the database, which is authoritative"""
+        now = time.time()
+
+        for post_id, post_counts in counts.items():
+            self._totals[post_id] = [int(post_counts.get(name) or 0) for name in COUNT_NAMES]
+            self._seeded_at[post_id] = now
+            self._last_used.setdefault(post_id, now)
+
+    async def load_counts(self, post_ids: List[str],
+                          fetch: Optional[Callable[[List[str]], Awaitable[Dict]]] = None) -> Dict[str, Dict[str, int]]:
+        """Counts for post_ids, fetching (by default from our own db) and tracking posts not tracked yet"""
+        counts = self.get_counts(post_ids)
+        missing_ids = [post_id for post_id in post_ids if post_id not in counts]
+
+        if missing_ids:
+            loaded = await self._fetch_counts(missing_ids, fetch or self.db.get_posts_engagement_data)
+            self.seed(loaded)
+            counts.update(loaded)
+
+        return counts
+
+    async def _fetch_counts(self, post_ids: List[str], fetch: Callable[..., Awaitable[Dict]]) -> Dict[str, Dict[str, int]]:
+        """Database counts up to the ingested point, plus the events ingested while they were fetched"""
+        cutoff = self.through
+        pending = {post_id: [0, 0, 0, 0] for post_id in post_ids}
+        entry = (cutoff, pending)
+        self._inflight.append(entry)
+
+        try:
+            loaded = await fetch(post_ids, until=cutoff)
+        finally:
+            self._inflight.remove(entry)
+
+        return {
+            post_id: {
+                name: int(post_counts.get(name) or 0) + pending[post_id][i]
+                for i, name in enumerate(COUNT_NAMES)
+            }
+            for post_id, post_counts in loaded.items() if post_id in pending
+        }
+
+    async def reconcile(self) -> Dict:
+        """Replace tracked counts with database counts, dropping posts that went idle"""
+        try:
+            started = time.time()
+            idle = [post_id for post_id, used in self._last_used.items() if used < started - self.idle_seconds]
+            for post_id in idle:
+                self._totals.pop(post_id, None)
+                self._last_used.pop(post_id, None)
+                self._seeded_at.pop(post_id, None)
+
+            post_ids = list(self._totals)
+            for start in range(0, len(post_ids), self.reconcile_batch_size):
+                batch = post_ids[start:start + self.reconcile_batch_size]
+                # Late-committed rows the tail skipped are included; events ingested meanwhile are kept
+                counts = await self._fetch_counts(batch, self.db.get_posts_engagement_data)
+                # Posts dropped while we were waiting stay dropped
+                self.seed({post_id: counts[post_id] for post_id in batch if post_id in self._totals and post_id in counts})
+
+            self.last_reconcile = {
+                'status': 'completed',
+                'posts': len(post_ids),
+                'dropped': len(idle),
+                'seconds': time.time() - started,
+                'finished_at': datetime.now().isoformat()
+            }
+
+        except Exception as e:
+            print(f"Error reconciling engagement counters: {e}")
+            self.last_reconcile = {'status': 'failed', 'error': str(e), 'finished_at': datetime.now().isoformat()}
+
+        return self.last_reconcile
+
+    def start(self, interval: Optional[float] = None):
+        """Reconcile with the database in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval or self.reconcile_interval))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.reconcile()
+
+    def get_info(self) -> Dict:
+        return {
+            'tracked_posts': len(self._totals),
+            'events_ingested': self.events_ingested,
+            'events_rejected': self.events_rejected,
+            'ingested_through': self.through.isoformat() if self.through else None,
+            'tail_current': self.is_tail_current(),
+            'reconciling': self._task is not None,
+            'last_reconcile': self.last_reconcile
+        }
+
+# Shared by ingestion and every FeatureExtractionService in the process
+engagement_counters = EngagementCounters()
@@ -0,0 +1,91 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from .database import DatabaseService
+from .engagement_counters import engagement_counters
+from .trending import trending_detector
+
+class EngagementTail:
+    """Polls user_engagement for newly written rows and hands them to in-memory consumers.
+
+    Every worker runs its own tail over the same table, so each worker's consumers see every
+    engagement, whichever process wrote it, at most interval + lag seconds after it happened.
+    """
+
+    def __init__(self, consumers: List, db: Optional[DatabaseService] = None, interval: Optional[float] = None,
+                 lag: Optional[float] = None):
+        self.db = db if db is not None else DatabaseService()
+        # Anything with ingest(events, through=...)
+        self.consumers = consumers
+        self.interval = interval or float(os.getenv('ENGAGEMENT_TAIL_INTERVAL_SECONDS', '2'))
+        # Rows younger than this are left for the next poll, so transactions still committing are not skipped
+        self.lag = lag if lag is not None else float(os.getenv('ENGAGEMENT_TAIL_LAG_SECONDS', '2'))
+        # Catching up after an outage is done in steps of at most this many seconds
+        self.max_span = float(os.getenv('ENGAGEMENT_TAIL_MAX_SPAN_SECONDS', '60'))
+        self.cursor: Optional[datetime] = None
+        self.polls = 0
+        self.events_read = 0
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def poll(self) -> bool:
+        """Read the engagements since the cursor and feed them to every consumer; True once caught up"""
+        until = datetime.now() - timedelta(seconds=self.lag)
+
+        if self.cursor is None:
+            # Start from the present; counts before it come from the database
+            events = []
+        else:
+            until = min(until, self.cursor + timedelta(seconds=self.max_span))
+            if until <= self.cursor:
+                return True
+
+            try:
+                events = await self.db.get_engagements_between(self.cursor, until)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error tailing engagements: {e}")
+                return True
+
+        for consumer in self.consumers:
+            consumer.ingest(events, through=until)
+
+        self.cursor = until
+        self.polls += 1
+        self.events_read += len(events)
+        return until >= datetime.now() - timedelta(seconds=self.lag + self.interval)
+
+    def start(self, interval: Optional[float] = None):
+        """Tail the engagement table in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval or self.interval))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, interval: float):
+        while True:
+            caught_up = await self.poll()
+            # Keep reading without pause while catching up
+            await asyncio.sleep(interval if caught_up else 0)
+
+    def get_info(self) -> Dict:
+        return {
+            'running': self._task is not None,
+            'cursor': self.cursor.isoformat() if self.cursor else None,
+            'interval_seconds': self.interval,
+            'lag_seconds': self.lag,
+            'polls': self.polls,
+            'events_read': self.events_read,
+            'errors': self.errors
+        }
+
+# One tail per process feeds the counters and trending detector every request reads
+engagement_tail = EngagementTail(consumers=[engagement_counters, trending_detector])
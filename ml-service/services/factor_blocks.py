@@ -0,0 +1,83 @@
+import numpy as np
+from typing import Tuple
+
+class StackedFactors:
+    """Factor rows of a memory-mapped base block followed by a small delta block.
+
+    Rows are gathered from either block on read, so the base stays a shared, read-only mapping.
+    """
+
+    ndim = 2
+
+    def __init__(self, base: np.ndarray, delta: np.ndarray):
+        self.base = base
+        self.delta = np.asarray(delta, dtype=base.dtype).reshape(-1, base.shape[1])
+        self.dtype = base.dtype
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (len(self.base) + len(self.delta), self.base.shape[1])
+
+    @property
+    def size(self) -> int:
+        return self.shape[0] * self.shape[1]
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def T(self) -> 'TransposedFactors':
+        return TransposedFactors(self)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        return np.asarray(np.vstack([self.base, self.delta]), dtype=dtype)
+
+    def __getitem__(self, rows) -> np.ndarray:
+        n_base = len(self.base)
+
+        if isinstance(rows, (int, np.integer)):
+            rows = int(rows) + len(self) if rows < 0 else int(rows)
+            return self.base[rows] if rows < n_base else self.delta[rows - n_base]
+
+        if isinstance(rows, slice):
+            rows = np.arange(len(self))[rows]
+
+        rows = np.asarray(rows, dtype=np.int64)
+        if rows.ndim != 1:
+            raise IndexError("StackedFactors only supports integer rows, slices and 1-d row arrays")
+
+        out = np.empty((len(rows), self.shape[1]), dtype=self.dtype)
+        in_base = rows < n_base
+        out[in_base] = self.base[rows[in_base]]
+        out[~in_base] = self.delta[rows[~in_base] - n_base]
+        return out
+
+class TransposedFactors:
+    """k x rows view of StackedFactors, as item factors are laid out in the model"""
+
+    ndim = 2
+
+    def __init__(self, factors: StackedFactors):
+        self.factors = factors
+        self.dtype = factors.dtype
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.factors.shape[::-1]
+
+    @property
+    def size(self) -> int:
+        return self.factors.size
+
+    @property
+    def T(self) -> StackedFactors:
+        return self.factors
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        return np.asarray(self.factors, dtype=dtype).T
+
+    def __getitem__(self, key) -> np.ndarray:
+        # Only column selection is supported: [:, rows]
+        if not (isinstance(key, tuple) and len(key) == 2 and key[0] == slice(None)):
+            raise IndexError("TransposedFactors only supports [:, columns]")
+        return self.factors[key[1]].T
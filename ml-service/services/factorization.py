@@ -0,0 +1,276 @@
+import os
+import time
+import numpy as np
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from scipy import sparse
+from sklearn.decomposition import NMF, MiniBatchNMF, non_negative_factorization
+from typing import Callable, Dict, Iterable, List
+
+# Default ALS thread count never exceeds this, however many cores the host reports
+MAX_DEFAULT_THREADS = 8
+
+class Factorizer(ABC):
+    """Collaborative filtering engine that factorizes a sparse user x item matrix"""
+
+    name = 'base'
+    # Engines that can train from batches of user rows without the full matrix in memory
+    supports_streaming = False
+
+    @abstractmethod
+    def fit(self, matrix: sparse.csr_matrix, n_factors: int) -> Dict:
+        """Return user_factors (users x k), item_factors (k x items) and training stats"""
+
+    def fit_batches(self, batches: Callable[[], Iterable[sparse.csr_matrix]], n_factors: int) -> Dict:
+        """Return item_factors (k x items) and stats, learned from preprocessed batches of user rows.
+
+        `batches` is called once per pass and every batch must have one column per item. Engines
+        without supports_streaming stack every batch in memory and fit once; `preprocess` must
+        therefore be idempotent for them.
+        """
+        results = self.fit(sparse.vstack(list(batches()), format='csr'), n_factors)
+        results.pop('user_factors', None)
+        return results
+
+    def preprocess(self, matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+        """Transform applied to the raw user x item matrix before fitting"""
+        return matrix
+
+    @abstractmethod
+    def fold_in(self, matrix: sparse.csr_matrix, fixed_factors: np.ndarray) -> np.ndarray:
+        """Factors for new rows of a preprocessed matrix whose columns match the rows of `fixed_factors`"""
+
+class NMFFactorizer(Factorizer):
+    """Non-negative matrix factorization on the row-normalized matrix"""
+
+    name = 'nmf'
+
+    def __init__(self, max_iter: int = 200, random_state: int = 42):
+        self.max_iter = max_iter
+        self.random_state = random_state
+
+    def fit(self, matrix: sparse.csr_matrix, n_factors: int) -> Dict:
+        started = time.perf_counter()
+
+        normalized_matrix = self.preprocess(matrix)
+
+        nmf_model = NMF(n_components=n_factors, random_state=self.random_state, max_iter=self.max_iter)
+        user_factors = nmf_model.fit_transform(normalized_matrix)
+
+        return {
+            'user_factors': user_factors,
+            'item_factors': nmf_model.components_,
+            'stats': {
+                'engine': self.name,
+                'wall_clock_seconds': time.perf_counter() - started,
+                'iterations': int(nmf_model.n_iter_),
+                'reconstruction_error': float(nmf_model.reconstruction_err_)
+            }
+        }
+
+    def preprocess(self, matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+        # Normalize each row to sum to one without densifying
+        row_sums = np.asarray(matrix.sum(axis=1)).ravel()
+        inverse_sums = np.divide(1.0, row_sums, out=np.zeros_like(row_sums), where=row_sums > 0)
+        return sparse.csr_matrix(sparse.diags(inverse_sums) @ matrix)
+
+    def fold_in(self, matrix: sparse.csr_matrix, fixed_factors: np.ndarray) -> np.ndarray:
+        # Same non-negative solve NMF.transform runs, with the learned factors held fixed
+        fixed_factors = np.asarray(fixed_factors, dtype=np.float64)
+        factors, _, _ = non_negative_factorization(
+            sparse.csr_matrix(matrix, dtype=np.float64),
+            H=np.ascontiguousarray(fixed_factors.T),
+            n_components=fixed_factors.shape[1],
+            update_H=False,
+            max_iter=self.max_iter
+        )
+        return factors
+
+class MiniBatchNMFFactorizer(NMFFactorizer):
+    """NMF trained with partial_fit over batches of users, for interaction sets larger than memory"""
+
+    name = 'minibatch_nmf'
+    supports_streaming = True
+
+    def __init__(self, epochs: int = 5, batch_size: int = 1024, random_state: int = 42):
+        super().__init__(random_state=random_state)
+        self.epochs = epochs
+        self.batch_size = batch_size
+
+    def fit(self, matrix: sparse.csr_matrix, n_factors: int) -> Dict:
+        normalized_matrix = self.preprocess(matrix)
+        results = self.fit_batches(lambda: [normalized_matrix], n_factors)
+        results['user_factors'] = self.fold_in(normalized_matrix, results['item_factors'].T)
+        return results
+
+    def fit_batches(self, batches: Callable[[], Iterable[sparse.csr_matrix]], n_factors: int) -> Dict:
+        started = time.perf_counter()
+        nmf_model = MiniBatchNMF(n_components=n_factors, batch_size=self.batch_size, random_state=self.random_state)
+
+        interactions = 0
+        n_batches = 0
+
+        for _ in range(self.epochs):
+            # partial_fit treats its input as a single mini-batch, so regroup rows into batch_size chunks
+            pending = []
+            pending_rows = 0
+            for matrix in batches():
+                pending.append(matrix)
+                pending_rows += matrix.shape[0]
+                if pending_rows < self.batch_size:
+                    continue
+
+                rows = sparse.vstack(pending, format='csr')
+                full_rows = rows.shape[0] - rows.shape[0] % self.batch_size
+                for start in range(0, full_rows, self.batch_size):
+                    batch = rows[start:start + self.batch_size]
+                    nmf_model.partial_fit(batch)
+                    interactions += batch.nnz
+                    n_batches += 1
+
+                pending = [rows[full_rows:]]
+                pending_rows = rows.shape[0] - full_rows
+
+            if pending_rows:
+                batch = sparse.vstack(pending, format='csr')
+                nmf_model.partial_fit(batch)
+                interactions += batch.nnz
+                n_batches += 1
+
+        wall_clock_seconds = time.perf_counter() - started
+
+        return {
+            'item_factors': nmf_model.components_,
+            'stats': {
+                'engine': self.name,
+                'wall_clock_seconds': wall_clock_seconds,
+                'epochs': self.epochs,
+                'batches': n_batches,
+                'interactions': interactions // max(self.epochs, 1),
+                'interactions_per_second': interactions / max(wall_clock_seconds, 1e-9)
+            }
+        }
+
+class ImplicitALSFactorizer(Factorizer):
+    """Confidence-weighted alternating least squares for implicit feedback (Hu, Koren & Volinsky)"""
+
+    name = 'als'
+
+    def __init__(self, iterations: int = 15, regularization: float = 0.01, alpha: float = 40.0,
+                 n_threads: int = None, block_rows: int = 1024, chunk_bytes: int = 32 * 2 ** 20,
+                 random_state: int = 42):
+        self.iterations = iterations
+        self.regularization = regularization
+        self.alpha = alpha
+        self.n_threads = n_threads or int(os.getenv('ALS_THREADS', '0')) or min(os.cpu_count() or 1, MAX_DEFAULT_THREADS)
+        self.block_rows = block_rows
+        # Scratch memory per thread for the outer products of one chunk of interactions
+        self.chunk_bytes = chunk_bytes
+        self.random_state = random_state
+
+    def fit(self, matrix: sparse.csr_matrix, n_factors: int) -> Dict:
+        started = time.perf_counter()
+
+        matrix = sparse.csr_matrix(matrix, dtype=np.float64)
+        matrix.sort_indices()
+        transposed = matrix.T.tocsr()
+
+        rng = np.random.default_rng(self.random_state)
+        user_factors = rng.normal(scale=0.01, size=(matrix.shape[0], n_factors))
+        item_factors = rng.normal(scale=0.01, size=(matrix.shape[1], n_factors))
+
+        iteration_seconds: List[float] = []
+
+        with ThreadPoolExecutor(max_workers=self.n_threads) as executor:
+            for _ in range(self.iterations):
+                iteration_started = time.perf_counter()
+                self._solve(matrix, item_factors, user_factors, executor)
+                self._solve(transposed, user_factors, item_factors, executor)
+                iteration_seconds.append(time.perf_counter() - iteration_started)
+
+        return {
+            'user_factors': user_factors,
+            'item_factors': item_factors.T,
+            'stats': {
+                'engine': self.name,
+                'wall_clock_seconds': time.perf_counter() - started,
+                'iterations': self.iterations,
+                'iteration_seconds': iteration_seconds,
+                'threads': self.n_threads,
+                'interactions': int(matrix.nnz)
+            }
+        }
+
+    def fold_in(self, matrix: sparse.csr_matrix, fixed_factors: np.ndarray) -> np.ndarray:
+        # One half-step of ALS restricted to the new rows
+        matrix = sparse.csr_matrix(matrix, dtype=np.float64)
+        matrix.sort_indices()
+        fixed_factors = np.asarray(fixed_factors, dtype=np.float64)
+        out = np.zeros((matrix.shape[0], fixed_factors.shape[1]))
+
+        with ThreadPoolExecutor(max_workers=self.n_threads) as executor:
+            self._solve(matrix, fixed_factors, out, executor)
+
+        return out
+
+    def _solve(self, matrix: sparse.csr_matrix, fixed: np.ndarray, out: np.ndarray, executor: ThreadPoolExecutor):
+        """Recompute every row of `out` against the `fixed` factors"""
+        n_factors = fixed.shape[1]
+        base = fixed.T @ fixed + self.regularization * np.eye(n_factors)
+
+        blocks = [
+            (start, min(start + self.block_rows, matrix.shape[0]))
+            for start in range(0, matrix.shape[0], self.block_rows)
+        ]
+
+        # Blocks write disjoint rows of `out`, so they can run in parallel
+        list(executor.map(lambda block: self._solve_block(matrix, fixed, base, out, *block), blocks))
+
+    def _solve_block(self, matrix: sparse.csr_matrix, fixed: np.ndarray, base: np.ndarray,
+                     out: np.ndarray, start: int, stop: int):
+        n_rows = stop - start
+        n_factors = fixed.shape[1]
+
+        indptr = matrix.indptr[start:stop + 1]
+        lo, hi = indptr[0], indptr[-1]
+
+        lhs = np.broadcast_to(base.ravel(), (n_rows, n_factors * n_factors)).copy()
+        rhs = np.zeros((n_rows, n_factors))
+
+        if hi > lo:
+            # Each interaction's outer product is k x k float64
+            chunk_nnz = max(1, self.chunk_bytes // (n_factors * n_factors * 8))
+            columns = matrix.indices[lo:hi]
+            confidence = self.alpha * matrix.data[lo:hi]  # C - 1
+            owners = np.repeat(np.arange(n_rows), np.diff(indptr))
+            fixed_rows = fixed[columns]
+
+            # Y^T C p: preference is 1 for every observed interaction
+            rhs += sparse.csr_matrix(
+                (1.0 + confidence, (owners, np.arange(hi - lo))), shape=(n_rows, hi - lo)
+            ) @ fixed_rows
+
+            # Y^T (C - I) Y, accumulated in bounded chunks of outer products
+            for chunk_start in range(0, hi - lo, chunk_nnz):
+                chunk = slice(chunk_start, min(chunk_start + chunk_nnz, hi - lo))
+                chunk_rows = fixed_rows[chunk]
+                outer = (chunk_rows[:, :, None] * chunk_rows[:, None, :]).reshape(len(chunk_rows), -1)
+                weights = sparse.csr_matrix(
+                    (confidence[chunk], (owners[chunk], np.arange(len(chunk_rows)))),
+                    shape=(n_rows, len(chunk_rows))
+                )
+                lhs += weights @ outer
+
+        out[start:stop] = np.linalg.solve(lhs.reshape(n_rows, n_factors, n_factors), rhs[:, :, None])[:, :, 0]
+
+FACTORIZERS = {
+    NMFFactorizer.name: NMFFactorizer,
+    MiniBatchNMFFactorizer.name: MiniBatchNMFFactorizer,
+    ImplicitALSFactorizer.name: ImplicitALSFactorizer
+}
+
+def create_factorizer(engine: str, **kwargs) -> Factorizer:
+    """Build the factorizer registered under `engine`"""
+    if engine not in FACTORIZERS:
+        raise ValueError(f"Unknown CF engine '{engine}', expected one of {sorted(FACTORIZERS)}")
+    return FACTORIZERS[engine](**kwargs)
@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+class FeatureCache:
+    """Process-wide LRU cache of feature lookups, bounded by an estimated memory budget and a TTL"""
+
+    def __init__(self, max_bytes: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('FEATURE_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('FEATURE_CACHE_TTL_SECONDS', '60'))
+        # key -> (value, expires_at, size_bytes), least recently used first
+        self._entries: 'OrderedDict[Hashable, Tuple[Any, float, int]]' = OrderedDict()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return default
+
+        if entry[1] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return default
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Cached values for the keys that are present, dropping misses"""
+        missing = object()
+        values = {key: self.get(key, missing) for key in keys}
+        return {key: value for key, value in values.items() if value is not missing}
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None):
+        size = _estimate_size(key) + _estimate_size(value)
+
+        if key in self._entries:
+            self._remove(key)
+
+        # Anything larger than the whole budget is not worth evicting everything else for
+        if size > self.max_bytes:
+            return
+
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries[key] = (value, time.monotonic() + ttl, size)
+        self.size_bytes += size
+        self._evict()
+
+    def set_many(self, values: Dict[Hashable, Any], ttl_seconds: Optional[float] = None):
+        for key, value in values.items():
+            self.set(key, value, ttl_seconds)
+
+    def invalidate(self, key: Hashable):
+        if key in self._entries:
+            self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def _remove(self, key: Hashable):
+        _, _, size = self._entries.pop(key)
+        self.size_bytes -= size
+
+    def _evict(self):
+        while self.size_bytes > self.max_bytes and self._entries:
+            key, (_, expires_at, size) = self._entries.popitem(last=False)
+            self.size_bytes -= size
+
+            if expires_at <= time.monotonic():
+                self.expirations += 1
+            else:
+                self.evictions += 1
+
+    def get_info(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'size_bytes': self.size_bytes,
+            'max_bytes': self.max_bytes,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+def _estimate_size(value: Any) -> int:
+    """Approximate deep size in bytes of plain feature values (dicts, lists, scalars)"""
+    size = sys.getsizeof(value)
+
+    if isinstance(value, dict):
+        size += sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_estimate_size(item) for item in value)
+
+    return size
+
+# Shared by every FeatureExtractionService in the process, including request-scoped ones
+feature_cache = FeatureCache()
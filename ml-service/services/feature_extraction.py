@@ -1,16 +1,32 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional
 from datetime import datetime, timedelta
 import asyncio
 from .database import DatabaseService
+from .feature_cache import FeatureCache, feature_cache
+from .redis_cache import RedisFeatureCache, redis_feature_cache
+from .engagement_counters import EngagementCounters, engagement_counters
 
 class FeatureExtractionService:
-    def __init__(self):
-        self.db = DatabaseService()
+    def __init__(self, db: Optional[DatabaseService] = None, cache: Optional[FeatureCache] = None,
+                 shared_cache: Optional[RedisFeatureCache] = None, counters: Optional[EngagementCounters] = None):
+        self.db = db if db is not None else DatabaseService()
+        self.cache = cache if cache is not None else feature_cache
+        self.shared_cache = shared_cache if shared_cache is not None else redis_feature_cache
+        self.counters = counters if counters is not None else engagement_counters
     
     async def extract_user_features(self, user_id: str) -> Dict:
         """Extract user-level features for recommendation"""
+        features = await self._cached_lookup('user', [user_id], self._compute_users_features)
+        # Cached dicts are shared between requests
+        return dict(features[user_id])
+    
+    async def _compute_users_features(self, user_ids: List[str]) -> Dict[str, Dict]:
+        features = await asyncio.gather(*[self._compute_user_features(user_id) for user_id in user_ids])
+        return dict(zip(user_ids, features))
+    
+    async def _compute_user_features(self, user_id: str) -> Dict:
         user_data = await self.db.get_user_engagement_history(user_id, days=30)
         
         if not user_data:
@@ -33,27 +49,124 @@ class FeatureExtractionService:
     
     async def extract_post_features(self, post_id: str) -> Dict:
         """Extract post-level features"""
-        post_data = await self.db.get_post_data(post_id)
-        engagement_data = await self.db.get_post_engagement_data(post_id)
+        features = await self.extract_posts_features([post_id])
+        return features[post_id]
+    
+    async def extract_posts_features(self, post_ids: List[str]) -> Dict[str, Dict]:
+        """Extract post-level features for many posts in a constant number of queries"""
+        post_ids = list(dict.fromkeys(post_ids))
         
-        if not post_data:
-            return self._default_post_features(post_id)
+        if not post_ids:
+            return {}
         
-        features = {
+        # Post summaries are cached and counts kept current by the engagement counters;
+        # features are rebuilt so age_hours stays current
+        posts, engagement = await asyncio.gather(
+            self._cached_lookup('post', post_ids, self._load_posts),
+            self.counters.load_counts(post_ids, self.db.get_posts_engagement_data)
+        )
+        
+        author_ids = list({post['user_id'] for post in posts.values()})
+        author_popularity = await self._get_authors_popularity(author_ids) if author_ids else {}
+        
+        features = {}
+        for post_id in post_ids:
+            if post_id not in posts:
+                features[post_id] = self._default_post_features(post_id)
+                continue
+            
+            post = posts[post_id]
+            features[post_id] = self._build_post_features(
+                post_id,
+                post,
+                engagement.get(post_id, {}),
+                author_popularity.get(post['user_id'], 0)
+            )
+        
+        return features
+    
+    async def _load_posts(self, post_ids: List[str]) -> Dict[str, Dict]:
+        posts_data = await self.db.get_posts_data(post_ids)
+        return {post_id: self._summarize_post(post_data) for post_id, post_data in posts_data.items()}
+    
+    def _summarize_post(self, post_data: Dict) -> Dict:
+        """The fields of a post row that features use, without its content"""
+        return {
+            'user_id': post_data['user_id'],
+            'created_at': post_data['created_at'],
+            'content_length': len(post_data.get('content') or ''),
+            'has_media': bool(post_data.get('image_url'))
+        }
+    
+    async def _cached_lookup(self, namespace: str, ids: List[str],
+                             load: Callable[[List[str]], Awaitable[Dict]]) -> Dict:
+        """Values from the in-process cache, then Redis, then `load`, filling the faster tiers on the way back"""
+        cached = self.cache.get_many([(namespace, id_) for id_ in ids])
+        values = {key[1]: value for key, value in cached.items()}
+        missing_ids = [id_ for id_ in ids if id_ not in values]
+        
+        if missing_ids:
+            shared = await self.shared_cache.get_many(namespace, missing_ids)
+            for id_, value in shared.items():
+                self.cache.set((namespace, id_), value)
+            values.update(shared)
+            missing_ids = [id_ for id_ in missing_ids if id_ not in shared]
+        
+        if missing_ids:
+            loaded = await load(missing_ids)
+            for id_, value in loaded.items():
+                self.cache.set((namespace, id_), value)
+            await self.shared_cache.set_many(namespace, loaded)
+            values.update(loaded)
+        
+        return values
+    
+    async def extract_catalog_post_features(self) -> pd.DataFrame:
+        """Post features for the whole catalog from two aggregate queries, one row per post"""
+        posts, engagement = await asyncio.gather(
+            self.db.get_post_catalog_columns(),
+            self.db.get_post_engagement_count_columns()
+        )
+        
+        counts = ['views', 'likes', 'comments', 'shares', 'total_engagements']
+        df = posts.merge(engagement, on='post_id', how='left')
+        df[counts] = df[counts].fillna(0).astype(np.int64)
+        
+        # Same definitions as _build_post_features, vectorized over the catalog
+        author_totals = df.groupby('author_id')['total_engagements'].transform('sum')
+        author_posts = df.groupby('author_id')['post_id'].transform('size')
+        engagements = df['views'] + df['likes'] + df['comments'] + df['shares']
+        age_hours = (datetime.now() - df['created_at']).dt.total_seconds() / 3600
+        
+        return pd.DataFrame({
+            'post_id': df['post_id'],
+            'age_hours': age_hours,
+            'total_views': df['views'],
+            'total_likes': df['likes'],
+            'total_comments': df['comments'],
+            'total_shares': df['shares'],
+            'engagement_velocity': engagements.astype(np.float64) / age_hours.clip(lower=1),
+            'author_popularity': author_totals / author_posts.clip(lower=1),
+            'content_length': df['content_length'],
+            'has_media': df['has_media'],
+            'virality_score': df['shares'] / df['views'].clip(lower=1)
+        })
+    
+    def _build_post_features(self, post_id: str, post: Dict, engagement_data: Dict, author_popularity: float) -> Dict:
+        age_hours = (datetime.now() - post['created_at']).total_seconds() / 3600
+        return {
             'post_id': post_id,
-            'age_hours': (datetime.now() - post_data['created_at']).total_seconds() / 3600,
+            'age_hours': age_hours,
             'total_views': engagement_data.get('views', 0),
             'total_likes': engagement_data.get('likes', 0),
             'total_comments': engagement_data.get('comments', 0),
             'total_shares': engagement_data.get('shares', 0),
-            'engagement_velocity': self._calculate_engagement_velocity(engagement_data),
-            'author_popularity': await self._get_author_popularity(post_data['user_id']),
-            'content_length': len(post_data.get('content', '')),
-            'has_media': bool(post_data.get('image_url')),
+            'engagement_velocity': self._calculate_engagement_velocity(engagement_data, age_hours),
+            'author_popularity': author_popularity,
+            'content_length': post['content_length'],
+            'has_media': post['has_media'],
             'virality_score': self._calculate_virality_score(engagement_data)
         }
-        
-        return features
     
     async def extract_interaction_features(self, user_id: str, post_id: str) -> Dict:
         """Extract user-post interaction features"""
@@ -142,14 +255,21 @@ class FeatureExtractionService:
         
         return recent_engagements / max(len(df), 1)
     
-    def _calculate_engagement_velocity(self, engagement_data: Dict) -> float:
+    def _calculate_engagement_velocity(self, engagement_data: Dict, age_hours: float) -> float:
         total_engagements = sum(engagement_data.values())
-        # Simplified velocity calculation
-        return total_engagements / max(1, engagement_data.get('age_hours', 1))
+        # Engagements per hour since the post was created
+        return total_engagements / max(1, age_hours)
     
-    async def _get_author_popularity(self, author_id: str) -> float:
-        author_stats = await self.db.get_author_stats(author_id)
-        return author_stats.get('avg_engagement_per_post', 0)
+    async def _get_authors_popularity(self, author_ids: List[str]) -> Dict[str, float]:
+        # The author stats query scans every engagement on the author's posts, so it is cached per author
+        return await self._cached_lookup('author', author_ids, self._load_authors_popularity)
+    
+    async def _load_authors_popularity(self, author_ids: List[str]) -> Dict[str, float]:
+        authors_stats = await self.db.get_authors_stats(author_ids)
+        return {
+            author_id: stats.get('avg_engagement_per_post', 0)
+            for author_id, stats in authors_stats.items()
+        }
     
     def _calculate_virality_score(self, engagement_data: Dict) -> float:
         shares = engagement_data.get('shares', 0)
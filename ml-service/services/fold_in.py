@@ -0,0 +1,229 @@
+import os
+import time
+import asyncio
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from scipy import sparse
+from typing import Dict, Optional, Tuple
+from .ann_index import add_to_ivf_index
+from .db_pool import pool_registry
+from .factorization import create_factorizer
+from .model_registry import ModelRegistry, model_registry
+from .model_store import artifact_path, load_model_artifact, read_fold_in_manifest, save_fold_in_artifact
+from .model_training import ModelTrainingService
+from .training_executor import TrainingExecutor
+
+# Held in the model directory while one worker computes a fold-in, so the others skip that round
+FOLD_IN_LOCK_FILE = 'fold_in.lock'
+
+def _run_fold_in_job(model_dir: str, model_version: str, max_window_hours: float) -> Dict:
+    """Process-pool entry point: fold in recent engagements and publish them next to the model artifact"""
+
+    async def run() -> Dict:
+        try:
+            return await publish_fold_in(model_dir, model_version, max_window_hours)
+        finally:
+            await pool_registry.close()
+
+    return asyncio.run(run())
+
+async def publish_fold_in(model_dir: str, model_version: str, max_window_hours: float) -> Dict:
+    """Fold engagements since model_version was trained into a delta artifact that every worker loads"""
+    base_model = load_model_artifact(artifact_path(model_dir, model_version))
+    training = ModelTrainingService()
+
+    now = datetime.now()
+    start_date = now - timedelta(hours=max_window_hours)
+    training_date = base_model['metadata'].get('training_date')
+    if training_date:
+        start_date = max(start_date, datetime.fromisoformat(str(training_date)))
+
+    scores = await training.fetch_engagement_scores(start_date, now)
+
+    fold_in, stats = build_fold_in(base_model, scores)
+    if fold_in is None:
+        return {'status': 'skipped', 'reason': 'nothing_new', **stats}
+
+    save_fold_in_artifact({**fold_in, 'stats': stats}, model_dir, model_version)
+    return {'status': 'completed', **stats}
+
+def build_fold_in(base_model: Dict, scores: pd.DataFrame) -> Tuple[Optional[Dict], Dict]:
+    """Float32 factors for users and posts missing from base_model, solved against its fixed factors"""
+    stats = {'engagements': len(scores), 'users': 0, 'items': 0}
+    if not len(scores):
+        return None, stats
+
+    collaborative = base_model['collaborative']
+    user_index = collaborative['user_index']
+    item_index = collaborative['item_index']
+    user_factors = collaborative['user_factors']
+    item_factors = collaborative['item_factors'].T  # items x k
+
+    user_ids = scores['user_id'].astype(str).to_numpy()
+    item_ids = scores['post_id'].astype(str).to_numpy()
+    user_rows, user_missing = user_index.lookup(user_ids)
+    item_rows, item_missing = item_index.lookup(item_ids)
+
+    # A new user needs at least one engagement with a known post to be solvable
+    new_user_ids = pd.unique(user_ids[user_missing & ~item_missing])
+    new_user_rows = dict(zip(new_user_ids, range(len(user_index), len(user_index) + len(new_user_ids))))
+    user_rows[user_missing] = [new_user_rows.get(user_id, -1) for user_id in user_ids[user_missing]]
+
+    # ...and a new post at least one engagement from a known or folded-in user
+    new_item_ids = pd.unique(item_ids[item_missing & (user_rows >= 0)])
+    new_item_rows = dict(zip(new_item_ids, range(len(item_index), len(item_index) + len(new_item_ids))))
+    item_rows[item_missing] = [new_item_rows.get(item_id, -1) for item_id in item_ids[item_missing]]
+
+    if not new_user_rows and not new_item_rows:
+        return None, stats
+
+    keep = (user_rows >= 0) & (item_rows >= 0)
+    n_users = len(user_index) + len(new_user_rows)
+    n_items = len(item_index) + len(new_item_rows)
+    n_factors = user_factors.shape[1]
+
+    factorizer = create_factorizer(base_model['metadata'].get('cf_training', {}).get('engine', 'nmf'))
+    matrix = factorizer.preprocess(sparse.csr_matrix(
+        (scores['final_score'].to_numpy(dtype=np.float64)[keep], (user_rows[keep], item_rows[keep])),
+        shape=(n_users, n_items)
+    ))
+
+    # Users first, against the trained post factors
+    new_user_factors = np.zeros((0, n_factors), dtype=np.float32)
+    if new_user_rows:
+        new_user_factors = factorizer.fold_in(matrix[len(user_index):, :len(item_index)], item_factors).astype(np.float32)
+
+    # Then posts, against trained and newly folded-in users
+    new_item_factors = np.zeros((0, n_factors), dtype=np.float32)
+    ann_index = None
+    if new_item_rows:
+        all_user_factors = np.concatenate([user_factors, new_user_factors]) if new_user_rows else user_factors
+        new_item_factors = factorizer.fold_in(matrix[:, len(item_index):].T.tocsr(), all_user_factors).astype(np.float32)
+
+        # Make new posts retrievable without re-clustering
+        if collaborative.get('ann_index') is not None:
+            ann_index = add_to_ivf_index(collaborative['ann_index'], new_item_factors, len(item_index))
+
+    stats.update({'users': len(new_user_rows), 'items': len(new_item_rows)})
+
+    return {
+        'user_factors': new_user_factors,
+        'item_factors': new_item_factors,
+        'user_ids': list(new_user_rows),
+        'item_ids': list(new_item_rows),
+        'ann_index': ann_index
+    }, stats
+
+class FoldInService:
+    """Gives users and posts that appeared after the last retrain real CF factors without retraining.
+
+    One worker at a time computes the fold-in in the training process pool and publishes it next to
+    the model artifact; every worker's registry then stacks it on top of the memory-mapped base.
+    """
+
+    def __init__(self, executor: TrainingExecutor, registry: Optional[ModelRegistry] = None):
+        self.executor = executor
+        self.registry = registry or model_registry
+        self.interval = float(os.getenv('FOLD_IN_INTERVAL_SECONDS', '300'))
+        # Engagements older than this are left to the next full retrain
+        self.max_window_hours = float(os.getenv('FOLD_IN_MAX_WINDOW_HOURS', '72'))
+        # A lock older than this was left by a worker that died mid-run
+        self.lock_timeout = float(os.getenv('FOLD_IN_LOCK_TIMEOUT_SECONDS', '3600'))
+        self.last_run: Optional[Dict] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def fold_in(self, force: bool = False) -> Dict:
+        """Publish a fold-in for the serving version unless one is recent, then serve the latest one"""
+        async with self._lock:
+            try:
+                model = self.registry.model
+                model_version = self.registry.model_version
+                if model is None or model['metadata'].get('is_fallback'):
+                    return self._record({'status': 'skipped', 'reason': 'no_trained_model'})
+
+                model_dir = self.registry.model_dir
+                if not os.path.isdir(artifact_path(model_dir, model_version)):
+                    return self._record({'status': 'skipped', 'reason': 'no_artifact'})
+
+                published = read_fold_in_manifest(model_dir, model_version)
+                if not force and published and self._age(published) < self.interval:
+                    result = {'status': 'skipped', 'reason': 'published_recently'}
+                elif not self._acquire_file_lock():
+                    result = {'status': 'skipped', 'reason': 'running_elsewhere'}
+                else:
+                    try:
+                        result = await self.executor.run_in_worker(
+                            _run_fold_in_job, model_dir, model_version, self.max_window_hours
+                        )
+                    finally:
+                        self._release_file_lock()
+
+                # Whichever worker published it, serve the newest fold-in
+                await self.registry.load_fold_in()
+
+                if result['status'] == 'completed':
+                    print(f"Folded in {result['users']} users and {result['items']} posts")
+                return self._record({**result, 'revision': self.registry.revision})
+
+            except Exception as e:
+                print(f"Error folding in new users and posts: {e}")
+                return self._record({'status': 'failed', 'error': str(e)})
+
+    def _age(self, manifest: Dict) -> float:
+        return (datetime.now() - datetime.fromisoformat(manifest['created_at'])).total_seconds()
+
+    def _lock_path(self) -> str:
+        return os.path.join(self.registry.model_dir, FOLD_IN_LOCK_FILE)
+
+    def _acquire_file_lock(self) -> bool:
+        path = self._lock_path()
+        try:
+            if time.time() - os.path.getmtime(path) > self.lock_timeout:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def _release_file_lock(self):
+        try:
+            os.remove(self._lock_path())
+        except FileNotFoundError:
+            pass
+
+    def _record(self, result: Dict) -> Dict:
+        self.last_run = {**result, 'finished_at': datetime.now().isoformat()}
+        return self.last_run
+
+    def start(self, interval: Optional[float] = None):
+        """Fold in new users and posts in the background"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(interval or self.interval))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.fold_in()
+
+    def get_info(self) -> Dict:
+        return {
+            'running': self._task is not None,
+            'interval_seconds': self.interval,
+            'revision': self.registry.revision,
+            'last_run': self.last_run
+        }
@@ -0,0 +1,93 @@
+import numpy as np
+from collections.abc import Sequence
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+class IdIndex:
+    """Hash map from user/post IDs to their row in the model's factor arrays"""
+
+    def __init__(self, ids: Iterable[Hashable]):
+        self.ids: List[Hashable] = list(ids)
+        self._rows: Dict[Hashable, int] = {id_: row for row, id_ in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.ids)
+
+    def __contains__(self, id_: Hashable) -> bool:
+        return id_ in self._rows
+
+    def get(self, id_: Hashable, default: Optional[int] = None) -> Optional[int]:
+        """Row for an ID, or default when the ID is unknown"""
+        return self._rows.get(id_, default)
+
+    def index(self, id_: Hashable) -> int:
+        """Row for an ID, raising ValueError like list.index when unknown"""
+        row = self._rows.get(id_)
+        if row is None:
+            raise ValueError(f"{id_!r} is not in index")
+        return row
+
+    def lookup(self, ids: Iterable[Hashable]) -> Tuple[np.ndarray, np.ndarray]:
+        """Map many IDs to rows at once; returns (rows, missing) with -1 rows for missing IDs"""
+        rows = np.fromiter((self._rows.get(id_, -1) for id_ in ids), dtype=np.int64)
+        return rows, rows < 0
+
+    def tolist(self) -> List[Hashable]:
+        return list(self.ids)
+
+class ExtendedIdIndex(IdIndex):
+    """An IdIndex followed by new IDs at the rows after it, built without copying the base index"""
+
+    def __init__(self, base: IdIndex, new_ids: Iterable[Hashable]):
+        self.base = base
+        self.extension = IdIndex(id_ for id_ in new_ids if id_ not in base)
+        self.ids = _ChainedIds(base.ids, self.extension.ids)
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.extension)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(self.ids)
+
+    def __contains__(self, id_: Hashable) -> bool:
+        return id_ in self.base or id_ in self.extension
+
+    def get(self, id_: Hashable, default: Optional[int] = None) -> Optional[int]:
+        row = self.base.get(id_)
+        if row is not None:
+            return row
+        row = self.extension.get(id_)
+        return default if row is None else len(self.base) + row
+
+    def index(self, id_: Hashable) -> int:
+        row = self.get(id_)
+        if row is None:
+            raise ValueError(f"{id_!r} is not in index")
+        return row
+
+    def lookup(self, ids: Iterable[Hashable]) -> Tuple[np.ndarray, np.ndarray]:
+        ids = list(ids)
+        rows, missing = self.base.lookup(ids)
+        if missing.any():
+            extension_rows, _ = self.extension.lookup([ids[i] for i in np.flatnonzero(missing)])
+            rows[missing] = np.where(extension_rows >= 0, extension_rows + len(self.base), -1)
+        return rows, rows < 0
+
+class _ChainedIds(Sequence):
+    """Read-only view of two ID lists as one"""
+
+    def __init__(self, first: List[Hashable], second: List[Hashable]):
+        self.first = first
+        self.second = second
+
+    def __len__(self) -> int:
+        return len(self.first) + len(self.second)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        return self.first[row] if row < len(self.first) else self.second[row - len(self.first)]
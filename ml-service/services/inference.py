@@ -3,65 +3,101 @@ import pandas as pd
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime
 import asyncio
-from .model_training import ModelTrainingService
+import os
+from .ann_index import search_ivf_index
+from .model_registry import ModelRegistry, model_registry
 from .feature_extraction import FeatureExtractionService
 from .database import DatabaseService
+from .loader import RequestScope
+from .neighbors import empty_neighbors, get_neighbors
+from .posting_lists import rank_users_by_overlap
+from .trending import TrendingDetector, trending_detector
 
 class InferenceService:
-    def __init__(self):
-        self.model_training = ModelTrainingService()
+    def __init__(self, registry: Optional[ModelRegistry] = None, trending: Optional[TrendingDetector] = None):
+        self.registry = registry or model_registry
+        self.trending = trending or trending_detector
         self.feature_extractor = FeatureExtractionService()
         self.db = DatabaseService()
+        # Posts retrieved by factor similarity per recommendation request, and inverted lists scanned
+        self.ann_candidates = int(os.getenv('ANN_CANDIDATES', '300'))
+        self.ann_probes = int(os.getenv('ANN_PROBES', '8'))
         
-    async def rank_posts_for_user(self, user_id: str, post_ids: List[str], limit: int = 20) -> List[Dict]:
+    async def rank_posts_for_user(self, user_id: str, post_ids: List[str], limit: int = 20,
+                                  scope: Optional[RequestScope] = None) -> List[Dict]:
         """Rank posts for a specific user using the trained model"""
         
-        # Load model if not available
-        if not self.model_training.model:
-            await self.model_training.load_model()
-        
-        if not self.model_training.model:
-            return await self._fallback_ranking(post_ids, limit)
-        
-        # Get predictions for all posts
-        predictions = []
-        
-        for post_id in post_ids:
-            try:
-                score = await self._predict_user_post_score(user_id, post_id)
-                predictions.append({
-                    'post_id': post_id,
-                    'score': score,
-                    'timestamp': datetime.now().isoformat()
-                })
-            except Exception as e:
-                print(f"Error predicting score for post {post_id}: {e}")
-                predictions.append({
-                    'post_id': post_id,
-                    'score': 0.1,  # Low default score
-                    'timestamp': datetime.now().isoformat()
-                })
+        # Lookups are shared across every candidate in this request
+        scope = scope or RequestScope(self.db)
+        
+        # The registry loads models eagerly at startup, so requests never wait on a load
+        if not self.registry.model:
+            return await self._fallback_ranking(post_ids, limit, scope)
+        
+        # Score all candidates in one batch
+        try:
+            scores = await self._predict_batch_scores(user_id, post_ids, scope)
+        except Exception as e:
+            print(f"Error in batch scoring for user {user_id}: {e}")
+            scores = np.full(len(post_ids), 0.1)  # Low default score
+        
+        timestamp = datetime.now().isoformat()
+        predictions = [
+            {
+                'post_id': post_id,
+                'score': float(score),
+                'timestamp': timestamp
+            }
+            for post_id, score in zip(post_ids, scores)
+        ]
         
         # Sort by score and return top results
         ranked_posts = sorted(predictions, key=lambda x: x['score'], reverse=True)
         return ranked_posts[:limit]
     
-    async def _predict_user_post_score(self, user_id: str, post_id: str) -> float:
+    async def _predict_user_post_score(self, user_id: str, post_id: str,
+                                       scope: Optional[RequestScope] = None) -> float:
         """Predict engagement score for user-post pair"""
+        scores = await self._predict_batch_scores(user_id, [post_id], scope or RequestScope(self.db))
+        return float(scores[0])
+    
+    async def _predict_batch_scores(self, user_id: str, post_ids: List[str], scope: RequestScope) -> np.ndarray:
+        """Predict engagement scores for a batch of posts for one user"""
+        
+        model = self.registry.model
         
-        model = self.model_training.model
+        if not post_ids:
+            return np.array([])
         
-        # Get collaborative filtering score
-        cf_score = await self._get_collaborative_score(user_id, post_id, model['collaborative'])
+        # Gather every post's inputs up front in bulk
+        user_features, posts_features, posts_data = await asyncio.gather(
+            scope.user_features.load(user_id),
+            scope.post_features.load_map(post_ids),
+            scope.get_posts_data(post_ids),
+            return_exceptions=True
+        )
         
-        # Get content-based score
-        content_score = await self._get_content_score(user_id, post_id, model['content'])
+        # A failed input only neutralizes the signals that depend on it
+        if isinstance(user_features, Exception):
+            print(f"Error extracting user features: {user_features}")
+            user_features = None
+        if isinstance(posts_features, Exception):
+            print(f"Error extracting post features: {posts_features}")
+            posts_features = {}
+        if isinstance(posts_data, Exception):
+            print(f"Error fetching post data: {posts_data}")
+            posts_data = {}
         
-        # Get popularity score
-        popularity_score = await self._get_popularity_score(post_id)
+        post_features = [posts_features.get(post_id) for post_id in post_ids]
+        post_data = [posts_data.get(post_id) for post_id in post_ids]
         
-        # Get freshness score
-        freshness_score = await self._get_freshness_score(post_id)
+        # Compute each signal as an array over the candidates
+        cf_scores = await self._get_collaborative_scores(
+            user_id, post_ids, model['collaborative'], model['content'], scope
+        )
+        content_scores = self._get_content_scores(user_features, post_features)
+        popularity_scores = self._get_popularity_scores(post_features)
+        freshness_scores = self._get_freshness_scores(post_data)
         
         # Combine scores with weights
         weights = {
@@ -71,170 +107,204 @@ class InferenceService:
             'freshness': 0.1
         }
         
-        final_score = (
-            cf_score * weights['collaborative'] +
-            content_score * weights['content'] +
-            popularity_score * weights['popularity'] +
-            freshness_score * weights['freshness']
+        final_scores = (
+            cf_scores * weights['collaborative'] +
+            content_scores * weights['content'] +
+            popularity_scores * weights['popularity'] +
+            freshness_scores * weights['freshness']
         )
         
-        return max(0.0, min(1.0, final_score))  # Clamp between 0 and 1
+        return np.clip(final_scores, 0.0, 1.0)  # Clamp between 0 and 1
     
-    async def _get_collaborative_score(self, user_id: str, post_id: str, cf_model: Dict) -> float:
-        """Get collaborative filtering score"""
+    async def _get_collaborative_scores(self, user_id: str, post_ids: List[str], cf_model: Dict,
+                                        content_model: Dict, scope: RequestScope) -> np.ndarray:
+        """Get collaborative filtering scores for a batch of posts"""
+        
+        scores = np.full(len(post_ids), 0.5)  # Neutral score for fallback
         
         if not cf_model['user_factors'].size or not cf_model['item_factors'].size:
-            return 0.5  # Neutral score for fallback
+            return scores
         
         try:
-            user_index = cf_model['user_index']
-            item_index = cf_model['item_index']
-            
-            if user_id not in user_index or post_id not in item_index:
-                # Handle cold start with similarity-based approach
-                return await self._handle_cold_start(user_id, post_id, cf_model)
+            # Resolved once per request: the user's own vector, or those of co-engaged users
+            user_vectors = await self._get_user_vectors(user_id, cf_model, scope)
+            if not len(user_vectors):
+                return np.full(len(post_ids), 0.3)  # Low score for completely new users
             
-            user_idx = user_index.index(user_id)
-            item_idx = item_index.index(post_id)
+            item_rows, missing = cf_model['item_index'].lookup(post_ids)
             
-            # Calculate dot product of user and item factors
-            user_factors = cf_model['user_factors'][user_idx]
-            item_factors = cf_model['item_factors'][:, item_idx]
+            if not missing.all():
+                # Single user-vector x item-factor product for all known posts
+                scores[~missing] = self._score_items(user_vectors, cf_model, item_rows[~missing])
             
-            score = np.dot(user_factors, item_factors)
+            # Handle cold start for the remaining posts
+            cold_positions = np.flatnonzero(missing).tolist()
+            if cold_positions:
+                cold_scores = await asyncio.gather(
+                    *[self._score_cold_post(user_vectors, post_ids[i], cf_model, content_model, scope)
+                      for i in cold_positions]
+                )
+                scores[cold_positions] = cold_scores
             
-            # Normalize score
-            return 1 / (1 + np.exp(-score))  # Sigmoid normalization
+            return scores
             
         except Exception as e:
-            print(f"Error in collaborative filtering: {e}")
-            return 0.5
+            print(f"Error in batch collaborative filtering: {e}")
+            return np.full(len(post_ids), 0.5)
     
-    async def _handle_cold_start(self, user_id: str, post_id: str, cf_model: Dict) -> float:
-        """Handle cold start problem using similarity"""
+    def _get_content_scores(self, user_features: Optional[Dict], post_features: List) -> np.ndarray:
+        """Get content-based scores for a batch of posts"""
         
-        try:
-            # For new users, use average of similar users
-            if user_id not in cf_model['user_index']:
-                # Get user's recent engagements to find similar users
-                user_engagements = await self.db.get_user_engagement_history(user_id, days=7)
-                
-                if not user_engagements:
-                    return 0.3  # Low score for completely new users
-                
-                # Find users who engaged with similar posts
-                similar_users = await self._find_similar_users(user_engagements, cf_model)
-                
-                if similar_users:
-                    # Average their scores for this post
-                    scores = []
-                    for similar_user_id in similar_users[:5]:  # Top 5 similar users
-                        if similar_user_id in cf_model['user_index']:
-                            score = await self._get_collaborative_score(similar_user_id, post_id, cf_model)
-                            scores.append(score)
-                    
-                    return np.mean(scores) if scores else 0.3
-            
-            # For new posts, use item-based similarity
-            if post_id not in cf_model['item_index']:
-                # Get post features and find similar posts
-                post_features = await self.feature_extractor.extract_post_features(post_id)
-                similar_posts = await self._find_similar_posts(post_features, cf_model)
-                
-                if similar_posts:
-                    scores = []
-                    for similar_post_id in similar_posts[:5]:
-                        if similar_post_id in cf_model['item_index']:
-                            score = await self._get_collaborative_score(user_id, similar_post_id, cf_model)
-                            scores.append(score)
-                    
-                    return np.mean(scores) if scores else 0.3
-            
-            return 0.3  # Default for cold start
-            
-        except Exception as e:
-            print(f"Error handling cold start: {e}")
-            return 0.3
-    
-    async def _get_content_score(self, user_id: str, post_id: str, content_model: Dict) -> float:
-        """Get content-based score"""
+        scores = np.full(len(post_features), 0.5)
+        valid = np.array([isinstance(features, dict) for features in post_features], dtype=bool)
+        
+        if user_features is None or not valid.any():
+            return scores
         
         try:
-            # Extract interaction features
-            features = await self.feature_extractor.extract_interaction_features(user_id, post_id)
+            valid_features = [features for features in post_features if isinstance(features, dict)]
             
-            # Simple content scoring based on feature matching
-            user_engagement_rate = features.get('engagement_rate', 0)
-            post_engagement_velocity = features.get('engagement_velocity', 0)
-            time_match = features.get('time_match', 0)
-            freshness = features.get('freshness_score', 0)
+            # User-level terms are shared across every candidate
+            user_engagement_rate = user_features.get('engagement_rate', 0)
+            time_match = self.feature_extractor._calculate_time_match(user_features, {})
+            
+            post_engagement_velocity = np.array(
+                [features.get('engagement_velocity', 0) for features in valid_features], dtype=float
+            )
+            age_hours = np.array([features.get('age_hours', 0) for features in valid_features], dtype=float)
+            freshness = np.exp(-age_hours / 24)
             
             # Weighted combination of content features
-            content_score = (
+            content_scores = (
                 user_engagement_rate * 0.3 +
                 post_engagement_velocity * 0.3 +
                 time_match * 0.2 +
                 freshness * 0.2
             )
             
-            return max(0.0, min(1.0, content_score))
+            scores[valid] = np.clip(content_scores, 0.0, 1.0)
+            return scores
             
         except Exception as e:
-            print(f"Error in content scoring: {e}")
-            return 0.5
+            print(f"Error in batch content scoring: {e}")
+            return np.full(len(post_features), 0.5)
     
-    async def _get_popularity_score(self, post_id: str) -> float:
-        """Get popularity-based score"""
+    def _get_popularity_scores(self, post_features: List) -> np.ndarray:
+        """Get popularity-based scores for a batch of posts"""
         
-        try:
-            post_features = await self.feature_extractor.extract_post_features(post_id)
-            
-            # Normalize engagement metrics
-            total_engagements = (
-                post_features.get('total_views', 0) * 1 +
-                post_features.get('total_likes', 0) * 3 +
-                post_features.get('total_comments', 0) * 5 +
-                post_features.get('total_shares', 0) * 7
-            )
-            
-            # Apply logarithmic scaling to prevent popular posts from dominating
-            popularity_score = np.log1p(total_engagements) / 10  # Normalize
-            
-            return max(0.0, min(1.0, popularity_score))
-            
-        except Exception as e:
-            print(f"Error calculating popularity score: {e}")
-            return 0.5
+        scores = np.full(len(post_features), 0.5)
+        valid = np.array([isinstance(features, dict) for features in post_features], dtype=bool)
+        
+        if not valid.any():
+            return scores
+        
+        engagement_counts = np.array(
+            [
+                [
+                    features.get('total_views', 0),
+                    features.get('total_likes', 0),
+                    features.get('total_comments', 0),
+                    features.get('total_shares', 0)
+                ]
+                for features in post_features if isinstance(features, dict)
+            ],
+            dtype=float
+        )
+        
+        # Normalize engagement metrics
+        total_engagements = engagement_counts @ np.array([1.0, 3.0, 5.0, 7.0])
+        
+        # Apply logarithmic scaling to prevent popular posts from dominating
+        scores[valid] = np.clip(np.log1p(total_engagements) / 10, 0.0, 1.0)
+        return scores
     
-    async def _get_freshness_score(self, post_id: str) -> float:
-        """Get freshness-based score"""
+    def _get_freshness_scores(self, post_data: List) -> np.ndarray:
+        """Get freshness-based scores for a batch of posts"""
         
+        scores = np.full(len(post_data), 0.5)
+        now = datetime.now()
+        
+        positions = [i for i, data in enumerate(post_data) if isinstance(data, dict)]
+        if not positions:
+            return scores
+        
+        # Calculate age in hours
+        age_hours = np.array(
+            [(now - post_data[i]['created_at']).total_seconds() / 3600 for i in positions]
+        )
+        
+        # Exponential decay with 24-hour half-life
+        scores[positions] = np.clip(np.exp(-age_hours / 24), 0.0, 1.0)
+        return scores
+    
+    async def _get_user_vectors(self, user_id: str, cf_model: Dict, scope: RequestScope) -> np.ndarray:
+        """Factor rows standing in for a user: their own, or the top 5 similar users' for new users"""
+        user_row = cf_model['user_index'].get(user_id)
+        if user_row is not None:
+            return cf_model['user_factors'][[user_row]]
+        
+        # Get user's recent engagements to find similar users
+        user_engagements = await scope.get_user_engagement_history(user_id, days=7)
+        if not user_engagements:
+            return cf_model['user_factors'][:0]
+        
+        similar_users = await self._find_similar_users(user_engagements, cf_model, scope)
+        similar_rows = [cf_model['user_index'].get(u) for u in similar_users if u in cf_model['user_index']]
+        
+        return cf_model['user_factors'][similar_rows[:5]]
+    
+    def _score_items(self, user_vectors: np.ndarray, cf_model: Dict, item_rows: np.ndarray) -> np.ndarray:
+        """Sigmoid of the factor product, averaged over the stand-in user vectors"""
+        raw_scores = user_vectors @ cf_model['item_factors'][:, item_rows]
+        return np.mean(1 / (1 + np.exp(-raw_scores)), axis=0)  # Sigmoid normalization
+    
+    async def _score_cold_post(self, user_vectors: np.ndarray, post_id: str, cf_model: Dict,
+                               content_model: Dict, scope: RequestScope) -> float:
+        """Score a post the model has no factors for through its most similar known posts"""
         try:
-            post_data = await self.db.get_post_data(post_id)
-            
-            if not post_data:
-                return 0.5
+            post_features = await scope.post_features.load(post_id)
+            similar_posts = await self._find_similar_posts(post_features, content_model, scope)
             
-            # Calculate age in hours
-            age_hours = (datetime.now() - post_data['created_at']).total_seconds() / 3600
+            similar_rows = [cf_model['item_index'].get(p) for p in similar_posts if p in cf_model['item_index']]
+            if not similar_rows:
+                return 0.3  # Default for cold start
             
-            # Exponential decay with 24-hour half-life
-            freshness_score = np.exp(-age_hours / 24)
-            
-            return max(0.0, min(1.0, freshness_score))
+            return float(np.mean(self._score_items(user_vectors, cf_model, np.array(similar_rows[:5]))))
             
         except Exception as e:
-            print(f"Error calculating freshness score: {e}")
-            return 0.5
+            print(f"Error handling cold start: {e}")
+            return 0.3
     
-    async def _find_similar_users(self, user_engagements: List[Dict], cf_model: Dict) -> List[str]:
+    async def _find_similar_users(self, user_engagements: List[Dict], cf_model: Dict,
+                                  scope: RequestScope) -> List[str]:
         """Find users with similar engagement patterns"""
         
         try:
             engaged_post_ids = [eng['post_id'] for eng in user_engagements]
             
-            # Find users who engaged with the same posts
-            similar_users = await self.db.find_users_by_posts(engaged_post_ids)
+            # Rank trained users by how many of the same posts they engaged with
+            item_users = cf_model.get('item_users')
+            if item_users is not None:
+                item_rows, missing = cf_model['item_index'].lookup(engaged_post_ids)
+                user_rows, _ = rank_users_by_overlap(item_users, item_rows[~missing], k=10)
+                return [cf_model['user_index'].ids[row] for row in user_rows]
+            
+            # Models saved without posting lists ask the database instead
+            similar_users = await scope.find_users_by_posts(engaged_post_ids)
+            
+            # Fill up with trained neighbours, ranked by their summed similarity to the co-engaged users
+            user_index = cf_model['user_index']
+            user_neighbors = cf_model.get('user_neighbors', empty_neighbors())
+            neighbor_scores = {}
+            for anchor in similar_users[:10]:
+                neighbor_rows, scores = get_neighbors(user_neighbors, user_index.get(anchor))
+                for row, score in zip(neighbor_rows.tolist(), scores.tolist()):
+                    neighbor_scores[row] = neighbor_scores.get(row, 0.0) + score
+            
+            ranked_neighbors = sorted(neighbor_scores, key=neighbor_scores.get, reverse=True)
+            similar_users = list(dict.fromkeys(
+                similar_users + [user_index.ids[row] for row in ranked_neighbors]
+            ))
             
             return similar_users[:10]  # Return top 10 similar users
             
@@ -242,52 +312,64 @@ class InferenceService:
             print(f"Error finding similar users: {e}")
             return []
     
-    async def _find_similar_posts(self, post_features: Dict, cf_model: Dict) -> List[str]:
+    async def _find_similar_posts(self, post_features: Dict, content_model: Dict,
+                                  scope: RequestScope) -> List[str]:
         """Find posts with similar features"""
         
         try:
-            # Simple similarity based on engagement metrics
-            target_engagement = post_features.get('engagement_velocity', 0)
-            target_popularity = post_features.get('author_popularity', 0)
+            # Posts in the content model have precomputed neighbours
+            content_row = content_model.get('post_index', {}).get(post_features.get('post_id'))
+            neighbor_rows, _ = get_neighbors(content_model.get('content_neighbors', empty_neighbors()), content_row)
             
-            # Find posts with similar characteristics
-            similar_posts = await self.db.find_similar_posts(target_engagement, target_popularity)
+            if len(neighbor_rows):
+                return [content_model['post_ids'][row] for row in neighbor_rows[:10]]
             
-            return similar_posts[:10]
+            # Newer posts are matched by their live features against the catalog's KD-tree
+            feature_index = content_model.get('feature_index')
+            if feature_index is None:
+                return []
+            
+            # The first cold post builds the tree, off the event loop
+            if not feature_index.is_built:
+                await asyncio.to_thread(feature_index.build)
+            
+            return feature_index.query(post_features, k=10)
             
         except Exception as e:
             print(f"Error finding similar posts: {e}")
             return []
     
-    async def _fallback_ranking(self, post_ids: List[str], limit: int) -> List[Dict]:
+    async def _fallback_ranking(self, post_ids: List[str], limit: int, scope: RequestScope) -> List[Dict]:
         """Fallback ranking when no model is available"""
         
         print("Using fallback ranking")
         
         # Simple popularity + freshness ranking
-        post_scores = []
-        
-        for post_id in post_ids:
-            try:
-                popularity_score = await self._get_popularity_score(post_id)
-                freshness_score = await self._get_freshness_score(post_id)
-                
-                # Simple weighted combination
-                final_score = popularity_score * 0.7 + freshness_score * 0.3
-                
-                post_scores.append({
-                    'post_id': post_id,
-                    'score': final_score,
-                    'timestamp': datetime.now().isoformat()
-                })
-                
-            except Exception as e:
-                print(f"Error in fallback ranking for post {post_id}: {e}")
-                post_scores.append({
-                    'post_id': post_id,
-                    'score': 0.1,
-                    'timestamp': datetime.now().isoformat()
-                })
+        try:
+            posts_features, posts_data = await asyncio.gather(
+                scope.post_features.load_map(post_ids),
+                scope.get_posts_data(post_ids)
+            )
+            
+            popularity_scores = self._get_popularity_scores([posts_features.get(post_id) for post_id in post_ids])
+            freshness_scores = self._get_freshness_scores([posts_data.get(post_id) for post_id in post_ids])
+            
+            # Simple weighted combination
+            scores = popularity_scores * 0.7 + freshness_scores * 0.3
+            
+        except Exception as e:
+            print(f"Error in fallback ranking: {e}")
+            scores = np.full(len(post_ids), 0.1)
+        
+        timestamp = datetime.now().isoformat()
+        post_scores = [
+            {
+                'post_id': post_id,
+                'score': float(score),
+                'timestamp': timestamp
+            }
+            for post_id, score in zip(post_ids, scores)
+        ]
         
         # Sort and return
         ranked_posts = sorted(post_scores, key=lambda x: x['score'], reverse=True)
@@ -296,17 +378,39 @@ class InferenceService:
     async def get_user_recommendations(self, user_id: str, limit: int = 20) -> List[Dict]:
         """Get personalized recommendations for a user"""
         
-        # Get candidate posts (recent posts from followed users + trending posts)
-        candidate_posts = await self._get_candidate_posts(user_id, limit * 3)
+        scope = RequestScope(self.db)
+        
+        # Posts closest to the user in factor space, plus recent and trending posts the model may not know yet
+        retrieved_posts = self._retrieve_candidate_posts(user_id, max(self.ann_candidates, limit * 3))
+        candidate_posts = list(dict.fromkeys(retrieved_posts + await self._get_candidate_posts(user_id, limit * 3)))
         
         if not candidate_posts:
             return []
         
         # Rank the candidate posts
-        ranked_posts = await self.rank_posts_for_user(user_id, candidate_posts, limit)
+        ranked_posts = await self.rank_posts_for_user(user_id, candidate_posts, limit, scope)
         
         return ranked_posts
     
+    def _retrieve_candidate_posts(self, user_id: str, limit: int) -> List[str]:
+        """Posts with the highest predicted affinity for a known user, from the ANN index over item factors"""
+        model = self.registry.model
+        if not model:
+            return []
+        
+        cf_model = model['collaborative']
+        ann_index = cf_model.get('ann_index')
+        user_row = cf_model['user_index'].get(user_id)
+        
+        if ann_index is None or user_row is None:
+            return []
+        
+        rows, _ = search_ivf_index(
+            ann_index, cf_model['item_factors'].T, cf_model['user_factors'][user_row], limit, self.ann_probes
+        )
+        item_ids = cf_model['item_index'].ids
+        return [item_ids[row] for row in rows]
+    
     async def _get_candidate_posts(self, user_id: str, limit: int) -> List[str]:
         """Get candidate posts for recommendation"""
         
@@ -314,8 +418,8 @@ class InferenceService:
             # Get recent posts (last 24 hours)
             recent_posts = await self.db.get_recent_posts(hours=24, limit=limit // 2)
             
-            # Get trending posts
-            trending_posts = await self.db.get_trending_posts(limit=limit // 2)
+            # Get trending posts from the event-fed detector, or the database while it is still cold
+            trending_posts = await self.trending.get_trending_posts(limit=limit // 2)
             
             # Combine and deduplicate
             all_posts = list(set(recent_posts + trending_posts))
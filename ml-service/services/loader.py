@@ -0,0 +1,125 @@
+import asyncio
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+from .database import DatabaseService
+from .feature_extraction import FeatureExtractionService
+
+class DataLoader:
+    """Coalesces and memoizes keyed lookups for the lifetime of one request"""
+
+    def __init__(self, batch_load_fn: Callable[[List[Hashable]], Awaitable[Dict]], max_batch_size: Optional[int] = None):
+        self.batch_load_fn = batch_load_fn
+        self.max_batch_size = max_batch_size
+        self._cache: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Hashable] = []
+        self._tasks = set()
+
+    async def load(self, key: Hashable) -> Any:
+        """Load one key, batching it with every other key requested in the same tick"""
+        future = self._cache.get(key)
+
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._cache[key] = future
+            self._queue.append(key)
+
+            # Dispatch once the currently runnable tasks have queued their keys
+            if len(self._queue) == 1:
+                loop.call_soon(self._dispatch)
+
+        return await asyncio.shield(future)
+
+    async def load_many(self, keys: List[Hashable]) -> List[Any]:
+        """Load many keys, preserving order"""
+        return list(await asyncio.gather(*[self.load(key) for key in keys]))
+
+    async def load_map(self, keys: List[Hashable]) -> Dict[Hashable, Any]:
+        """Load many keys into a dict, dropping keys that resolved to None"""
+        keys = list(dict.fromkeys(keys))
+        values = await self.load_many(keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def _dispatch(self):
+        keys, self._queue = self._queue, []
+        batch_size = self.max_batch_size or len(keys)
+
+        for start in range(0, len(keys), batch_size):
+            task = asyncio.ensure_future(self._load_batch(keys[start:start + batch_size]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _load_batch(self, keys: List[Hashable]):
+        try:
+            values = await self.batch_load_fn(keys)
+        except Exception as e:
+            # Drop failed keys so a later load can retry them
+            for key in keys:
+                future = self._cache.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        for key in keys:
+            future = self._cache[key]
+            if not future.done():
+                future.set_result(values.get(key))
+
+class RequestScope:
+    """Request-scoped DatabaseService view that fetches each post and user once"""
+
+    def __init__(self, db: DatabaseService):
+        self.db = db
+
+        # Raw lookups
+        self.post_data = DataLoader(db.get_posts_data)
+        self.post_engagement = DataLoader(db.get_posts_engagement_data)
+        self.author_stats = DataLoader(db.get_authors_stats)
+        self.user_history = DataLoader(self._load_user_histories)
+        self.users_by_posts = DataLoader(self._load_users_by_posts)
+
+        # Derived features
+        self.feature_extractor = FeatureExtractionService(db=self)
+        self.post_features = DataLoader(self.feature_extractor.extract_posts_features)
+        self.user_features = DataLoader(self._load_user_features)
+
+    def __getattr__(self, name: str):
+        # Queries without a loader pass straight through
+        return getattr(self.db, name)
+
+    async def get_post_data(self, post_id: str) -> Optional[Dict]:
+        return await self.post_data.load(post_id)
+
+    async def get_posts_data(self, post_ids: List[str]) -> Dict[str, Dict]:
+        return await self.post_data.load_map(post_ids)
+
+    async def get_posts_engagement_data(self, post_ids: List[str], until: Optional[datetime] = None) -> Dict[str, Dict]:
+        # Counts up to a cutoff differ from the all-time counts the loader caches
+        if until is not None:
+            return await self.db.get_posts_engagement_data(post_ids, until)
+        return await self.post_engagement.load_map(post_ids)
+
+    async def get_authors_stats(self, author_ids: List[str]) -> Dict[str, Dict]:
+        return await self.author_stats.load_map(author_ids)
+
+    async def get_user_engagement_history(self, user_id: str, days: int = 30) -> List[Dict]:
+        return await self.user_history.load((user_id, days))
+
+    async def find_users_by_posts(self, post_ids: List[str]) -> List[str]:
+        return await self.users_by_posts.load(tuple(post_ids))
+
+    async def _load_user_histories(self, keys: List[tuple]) -> Dict[tuple, List[Dict]]:
+        histories = await asyncio.gather(
+            *[self.db.get_user_engagement_history(user_id, days=days) for user_id, days in keys]
+        )
+        return dict(zip(keys, histories))
+
+    async def _load_users_by_posts(self, keys: List[tuple]) -> Dict[tuple, List[str]]:
+        users = await asyncio.gather(*[self.db.find_users_by_posts(list(post_ids)) for post_ids in keys])
+        return dict(zip(keys, users))
+
+    async def _load_user_features(self, user_ids: List[str]) -> Dict[str, Dict]:
+        features = await asyncio.gather(
+            *[self.feature_extractor.extract_user_features(user_id) for user_id in user_ids]
+        )
+        return dict(zip(user_ids, features))
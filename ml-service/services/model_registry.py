@@ -0,0 +1,136 @@
+import os
+import asyncio
+from datetime import datetime
+from typing import Dict, Optional
+from .database import DatabaseService
+from .model_store import (
+    apply_fold_in,
+    artifact_path,
+    fold_in_path,
+    legacy_pickle_path,
+    load_fold_in_artifact,
+    load_legacy_pickle,
+    load_model_artifact,
+    read_fold_in_manifest
+)
+
+class ModelRegistry:
+    """Process-wide holder of the serving model, shared by routes, training and inference"""
+
+    def __init__(self, model_dir: Optional[str] = None):
+        self.db = DatabaseService()
+        self.model_dir = model_dir or os.getenv('MODEL_DIR', 'models')
+        self.poll_interval = float(os.getenv('MODEL_POLL_INTERVAL_SECONDS', '60'))
+        self.model: Optional[Dict] = None
+        # The version as loaded from disk, before any fold-in
+        self.base_model: Optional[Dict] = None
+        self.model_version: Optional[str] = None
+        self.loaded_at: Optional[str] = None
+        # Revision of the published fold-in applied on top of the loaded version
+        self.revision = 0
+        self.updated_at: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._poll_task: Optional[asyncio.Task] = None
+
+    def install(self, model: Dict, model_version: str):
+        """Swap in a model; in-flight requests keep the model they started with"""
+        self.model = model
+        self.base_model = model
+        self.model_version = model_version
+        self.loaded_at = datetime.now().isoformat()
+        self.revision = 0
+        self.updated_at = None
+
+    async def load_fold_in(self) -> bool:
+        """Apply the fold-in published for the current version, if it is newer than the one applied"""
+        model_version, base_model = self.model_version, self.base_model
+        if base_model is None or not os.path.isdir(artifact_path(self.model_dir, model_version)):
+            return False
+
+        try:
+            manifest = read_fold_in_manifest(self.model_dir, model_version)
+            if manifest is None or manifest['revision'] == self.revision:
+                return False
+
+            fold_in = await asyncio.to_thread(load_fold_in_artifact, fold_in_path(self.model_dir, model_version))
+            model = apply_fold_in(base_model, fold_in)
+
+        except Exception as e:
+            print(f"Error loading fold-in for model {model_version}: {e}")
+            return False
+
+        async with self._lock:
+            # A new version loaded meanwhile starts without fold-in
+            if self.base_model is not base_model:
+                return False
+
+            self.model = model
+            self.revision = fold_in['manifest']['revision']
+            self.updated_at = datetime.now().isoformat()
+            return True
+
+    async def load_version(self, model_version: str) -> Dict:
+        """Load a specific model version from disk and make it current"""
+        async with self._lock:
+            if model_version == self.model_version and self.model is not None:
+                return self.model
+
+            model_path = artifact_path(self.model_dir, model_version)
+
+            # Arrays are memory-mapped so workers share pages via the OS page cache
+            if os.path.isdir(model_path):
+                model = await asyncio.to_thread(load_model_artifact, model_path)
+            else:
+                model = await asyncio.to_thread(load_legacy_pickle, legacy_pickle_path(self.model_dir, model_version))
+
+            self.install(model, model_version)
+            print(f"Loaded model version: {model_version}")
+            return model
+
+    async def load_latest(self) -> Optional[Dict]:
+        """Load the newest model recorded in the database, if it isn't already current"""
+        try:
+            model_metadata = await self.db.get_latest_model_metadata()
+
+            if not model_metadata:
+                print("No trained model found")
+                return self.model
+
+            await self.load_version(model_metadata['model_version'])
+            await self.load_fold_in()
+            return self.model
+
+        except Exception as e:
+            print(f"Error loading model: {e}")
+            return self.model
+
+    def start_polling(self, interval: Optional[float] = None):
+        """Check for new model versions in the background"""
+        if self._poll_task is None:
+            self._poll_task = asyncio.create_task(self._poll(interval or self.poll_interval))
+
+    async def stop_polling(self):
+        if self._poll_task:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+
+    async def _poll(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            await self.load_latest()
+
+    def get_info(self) -> Dict:
+        return {
+            'version': self.model_version,
+            'loaded_at': self.loaded_at,
+            'revision': self.revision,
+            'updated_at': self.updated_at,
+            'polling': self._poll_task is not None,
+            'poll_interval_seconds': self.poll_interval
+        }
+
+model_registry = ModelRegistry()
@@ -0,0 +1,282 @@
+import os
+import json
+import shutil
+import pickle
+import numpy as np
+from datetime import datetime
+from typing import Dict, Optional
+from .id_index import ExtendedIdIndex, IdIndex
+from .factor_blocks import StackedFactors
+from .ann_index import empty_ivf_index
+from .content_index import build_content_index
+from .neighbors import empty_neighbors
+from .posting_lists import empty_item_users
+
+# Bump when the on-disk layout changes
+ARTIFACT_FORMAT_VERSION = 2
+# Version 1 stored dense similarity matrices, which are not loaded; its models serve without neighbour lists
+SUPPORTED_FORMAT_VERSIONS = (1, 2)
+MANIFEST_FILE = 'manifest.json'
+
+def artifact_path(model_dir: str, model_version: str) -> str:
+    """Directory holding the artifact for a model version"""
+    return os.path.join(model_dir, f"recommendation_model_{model_version}")
+
+def fold_in_path(model_dir: str, model_version: str) -> str:
+    """Directory holding the factors folded in on top of a model version since it was trained"""
+    return f"{artifact_path(model_dir, model_version)}_fold_in"
+
+def legacy_pickle_path(model_dir: str, model_version: str) -> str:
+    """Path of a model saved by the pre-artifact pickle format"""
+    return os.path.join(model_dir, f"recommendation_model_{model_version}.pkl")
+
+def save_model_artifact(model: Dict, model_dir: str = 'models') -> str:
+    """Write a model as float32 .npy arrays plus a JSON manifest"""
+    path = artifact_path(model_dir, model['metadata']['model_version'])
+    collaborative = model['collaborative']
+    content = model['content']
+
+    arrays = {
+        'user_factors': _as_float32(collaborative['user_factors']),
+        # Item-major so that gathering candidate items reads contiguous rows
+        'item_factors': _as_float32(np.asarray(collaborative['item_factors']).T),
+        **_neighbor_arrays('user_neighbors', collaborative.get('user_neighbors')),
+        **_neighbor_arrays('item_neighbors', collaborative.get('item_neighbors')),
+        **_ann_arrays(collaborative.get('ann_index')),
+        **_item_users_arrays(collaborative.get('item_users')),
+        'user_ids': _as_str_array(collaborative['user_index']),
+        'item_ids': _as_str_array(collaborative['item_index']),
+        'content_features': _as_float32(content.get('features')),
+        'content_post_ids': _as_str_array(content.get('post_ids', [])),
+        **_neighbor_arrays('content_neighbors', content.get('content_neighbors')),
+        'feature_mean': _as_float32(content.get('feature_mean')),
+        'feature_scale': _as_float32(content.get('feature_scale'))
+    }
+
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'metadata': model['metadata'],
+        'collaborative': {'n_factors': int(collaborative['n_factors'])},
+        'content': {'feature_columns': list(content.get('feature_columns', []))}
+    }
+
+    return _write_arrays(path, arrays, manifest)
+
+def update_artifact_metadata(path: str, metadata: Dict):
+    """Replace the metadata in a saved artifact's manifest without rewriting its arrays"""
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({**manifest, 'metadata': metadata}, f, default=str)
+    os.replace(tmp_path, manifest_path)
+
+def save_fold_in_artifact(fold_in: Dict, model_dir: str, model_version: str) -> str:
+    """Write the factors of folded-in users and posts next to the artifact they extend"""
+    previous = read_fold_in_manifest(model_dir, model_version)
+
+    arrays = {
+        'user_factors': _as_float32(fold_in['user_factors']),
+        # Item-major like the base artifact
+        'item_factors': _as_float32(fold_in['item_factors']),
+        'user_ids': _as_str_array(fold_in['user_ids']),
+        'item_ids': _as_str_array(fold_in['item_ids'])
+    }
+    if fold_in.get('ann_index') is not None:
+        arrays.update({name: array for name, array in _ann_arrays(fold_in['ann_index']).items() if name != 'ann_centroids'})
+
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'model_version': model_version,
+        # Workers reload the fold-in whenever the revision they hold is out of date
+        'revision': (previous['revision'] + 1) if previous else 1,
+        'created_at': datetime.now().isoformat(),
+        'stats': fold_in.get('stats', {})
+    }
+
+    return _write_arrays(fold_in_path(model_dir, model_version), arrays, manifest)
+
+def read_fold_in_manifest(model_dir: str, model_version: str) -> Optional[Dict]:
+    """Manifest of the fold-in published for a model version, if any"""
+    try:
+        with open(os.path.join(fold_in_path(model_dir, model_version), MANIFEST_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def load_fold_in_artifact(path: str, mmap_mode: Optional[str] = 'r') -> Dict:
+    """Open a fold-in artifact; its manifest is returned under 'manifest'"""
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    def load(name: str) -> np.ndarray:
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+
+    fold_in = {
+        'user_factors': load('user_factors'),
+        'item_factors': load('item_factors'),
+        'user_ids': load('user_ids').tolist(),
+        'item_ids': load('item_ids').tolist(),
+        'ann_index': None,
+        'manifest': manifest
+    }
+    if 'ann_list_rows' in manifest['arrays']:
+        fold_in['ann_index'] = {name: load(f"ann_{name}") for name in ('list_offsets', 'list_rows')}
+
+    return fold_in
+
+def apply_fold_in(model: Dict, fold_in: Dict) -> Dict:
+    """Copy of a loaded model whose factors and ID indexes continue with the folded-in rows"""
+    collaborative = model['collaborative']
+    user_factors = collaborative['user_factors']
+    item_factors = collaborative['item_factors'].T  # items x k
+
+    ann_index = collaborative.get('ann_index')
+    if fold_in.get('ann_index') is not None and ann_index is not None:
+        # Centroids never change, only which rows each list holds
+        ann_index = {'centroids': ann_index['centroids'], **fold_in['ann_index']}
+
+    return {
+        **model,
+        'collaborative': {
+            **collaborative,
+            'user_factors': StackedFactors(user_factors, fold_in['user_factors']),
+            'item_factors': StackedFactors(item_factors, fold_in['item_factors']).T,
+            'ann_index': ann_index,
+            'user_index': ExtendedIdIndex(collaborative['user_index'], fold_in['user_ids']),
+            'item_index': ExtendedIdIndex(collaborative['item_index'], fold_in['item_ids'])
+        },
+        'metadata': {**model['metadata'], 'fold_in': fold_in['manifest'].get('stats', {})}
+    }
+
+def load_model_artifact(path: str, mmap_mode: Optional[str] = 'r') -> Dict:
+    """Open a model artifact, memory-mapping its arrays by default"""
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') not in SUPPORTED_FORMAT_VERSIONS:
+        raise ValueError(f"Unsupported model artifact format: {manifest.get('format_version')}")
+
+    def load(name: str) -> np.ndarray:
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+
+    def load_neighbors(name: str) -> Dict[str, np.ndarray]:
+        if f"{name}_indices" not in manifest['arrays']:
+            return empty_neighbors()
+        return {'indices': load(f"{name}_indices"), 'scores': load(f"{name}_scores")}
+
+    def load_ann_index() -> Dict[str, np.ndarray]:
+        # Artifacts written before the ANN index existed simply have none
+        if 'ann_centroids' not in manifest['arrays']:
+            return empty_ivf_index()
+        return {name: load(f"ann_{name}") for name in ('centroids', 'list_offsets', 'list_rows')}
+
+    def load_item_users() -> Optional[Dict[str, np.ndarray]]:
+        # Older artifacts have no posting lists; inference then falls back to the database
+        if 'item_users_indptr' not in manifest['arrays']:
+            return None
+        return {name: load(f"item_users_{name}") for name in ('indptr', 'indices')}
+
+    content_post_ids = load('content_post_ids').tolist()
+
+    content = {
+        'features': load('content_features'),
+        'feature_columns': manifest['content']['feature_columns'],
+        'post_ids': content_post_ids,
+        'post_index': IdIndex(content_post_ids),
+        'content_neighbors': load_neighbors('content_neighbors'),
+        'feature_mean': load('feature_mean'),
+        'feature_scale': load('feature_scale')
+    }
+    # The KD-tree is not stored; it is built by the first cold-post query
+    content['feature_index'] = build_content_index(content)
+
+    return {
+        'collaborative': {
+            'user_factors': load('user_factors'),
+            'item_factors': load('item_factors').T,
+            'user_neighbors': load_neighbors('user_neighbors'),
+            'item_neighbors': load_neighbors('item_neighbors'),
+            'ann_index': load_ann_index(),
+            'item_users': load_item_users(),
+            'user_index': IdIndex(load('user_ids').tolist()),
+            'item_index': IdIndex(load('item_ids').tolist()),
+            'n_factors': manifest['collaborative']['n_factors']
+        },
+        'content': content,
+        'metadata': manifest['metadata']
+    }
+
+def load_legacy_pickle(path: str) -> Dict:
+    """Load a model written by the old pickle-based _save_model"""
+    with open(path, 'rb') as f:
+        model = pickle.load(f)
+
+    collaborative = model['collaborative']
+    collaborative['user_index'] = IdIndex(collaborative['user_index'])
+    collaborative['item_index'] = IdIndex(collaborative['item_index'])
+    collaborative.setdefault('ann_index', empty_ivf_index())
+
+    content = model['content']
+    content['post_index'] = IdIndex(content.get('post_ids', []))
+    # Pickles kept the fitted StandardScaler instead of its statistics
+    scaler = content.get('scaler')
+    if scaler is not None and hasattr(scaler, 'mean_'):
+        content.setdefault('feature_mean', scaler.mean_)
+        content.setdefault('feature_scale', scaler.scale_)
+    content['feature_index'] = build_content_index(content)
+    return model
+
+def _write_arrays(path: str, arrays: Dict[str, np.ndarray], manifest: Dict) -> str:
+    """Save arrays and manifest to a scratch directory, then publish it at path in one step"""
+    tmp_path = f"{path}.tmp"
+
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    os.makedirs(tmp_path)
+
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), array, allow_pickle=False)
+
+    manifest = {**manifest, 'arrays': {name: list(array.shape) for name, array in arrays.items()}}
+    with open(os.path.join(tmp_path, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, default=str)
+
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+    return path
+
+def _neighbor_arrays(name: str, neighbors: Optional[Dict]) -> Dict[str, np.ndarray]:
+    neighbors = neighbors or empty_neighbors()
+    return {
+        f"{name}_indices": np.ascontiguousarray(neighbors['indices'], dtype=np.int32),
+        f"{name}_scores": _as_float32(neighbors['scores'])
+    }
+
+def _ann_arrays(index: Optional[Dict]) -> Dict[str, np.ndarray]:
+    index = index or empty_ivf_index()
+    return {
+        'ann_centroids': _as_float32(index['centroids']),
+        'ann_list_offsets': np.ascontiguousarray(index['list_offsets'], dtype=np.int64),
+        'ann_list_rows': np.ascontiguousarray(index['list_rows'], dtype=np.int32)
+    }
+
+def _item_users_arrays(item_users: Optional[Dict]) -> Dict[str, np.ndarray]:
+    item_users = item_users or empty_item_users()
+    return {
+        'item_users_indptr': np.ascontiguousarray(item_users['indptr'], dtype=np.int64),
+        'item_users_indices': np.ascontiguousarray(item_users['indices'], dtype=np.int32)
+    }
+
+def _as_float32(values) -> np.ndarray:
+    if values is None:
+        return np.zeros((0,), dtype=np.float32)
+    return np.ascontiguousarray(values, dtype=np.float32)
+
+def _as_str_array(values) -> np.ndarray:
+    # Fixed-width unicode keeps the index loadable without pickle
+    return np.asarray([str(value) for value in values], dtype=np.str_)
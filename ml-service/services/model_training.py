@@ -1,25 +1,66 @@
 import pandas as pd
 import numpy as np
-from sklearn.decomposition import NMF
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
 from sklearn.preprocessing import StandardScaler
-import pickle
+import os
+import time
 import asyncio
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Tuple, Optional
 from .database import DatabaseService
 from .feature_extraction import FeatureExtractionService
+from .factorization import create_factorizer
+from .ann_index import build_ivf_index, empty_ivf_index
+from .content_index import build_content_index
+from .id_index import IdIndex
+from .neighbors import empty_neighbors, top_k_cosine_neighbors
+from .posting_lists import build_item_users, empty_item_users
+from .model_registry import ModelRegistry, model_registry
+from .model_store import save_model_artifact, update_artifact_metadata
+from .training_snapshots import InteractionBuckets, TrainingSnapshotStore, empty_snapshot
+
+ENGAGEMENT_WEIGHTS = {
+    'VIEW': 1.0,
+    'LIKE': 3.0,
+    'COMMENT': 5.0,
+    'SHARE': 7.0
+}
 
 class ModelTrainingService:
-    def __init__(self):
+    def __init__(self, cf_engine: Optional[str] = None, registry: Optional[ModelRegistry] = None):
+        # Writes go to the primary; heavy reads get pools of their own
         self.db = DatabaseService()
-        self.feature_extractor = FeatureExtractionService()
-        self.model = None
-        self.user_factors = None
-        self.item_factors = None
+        self.training_db = DatabaseService(workload='training')
+        self.analytics_db = DatabaseService(workload='analytics')
+        self.feature_extractor = FeatureExtractionService(db=self.training_db)
+        self.registry = registry or model_registry
         self.scaler = StandardScaler()
-        self.model_version = None
-        
+        self.model_dir = os.getenv('MODEL_DIR', 'models')
+        self.snapshots = TrainingSnapshotStore()
+        # Days of engagement history; streaming engines train out of core and can afford more
+        self.window_days = int(os.getenv('TRAINING_WINDOW_DAYS', '30'))
+        self.streaming_window_days = int(os.getenv('STREAMING_TRAINING_WINDOW_DAYS', '90'))
+        self.streaming_buckets = int(os.getenv('STREAMING_TRAINING_BUCKETS', '64'))
+        self.n_neighbors = int(os.getenv('MODEL_NEIGHBORS', '20'))
+        self.cf_engine = cf_engine or os.getenv('CF_ENGINE', 'nmf')
+        self.progress_callback: Optional[Callable[[str, float], None]] = None
+        
+    @property
+    def model(self) -> Optional[Dict]:
+        return self.registry.model
+    
+    @property
+    def model_version(self) -> Optional[str]:
+        return self.registry.model_version
+    
+    @property
+    def user_factors(self) -> Optional[np.ndarray]:
+        return self.model['collaborative']['user_factors'] if self.model else None
+    
+    @property
+    def item_factors(self) -> Optional[np.ndarray]:
+        return self.model['collaborative']['item_factors'] if self.model else None
+    
     @classmethod
     async def initialize(cls):
         """Initialize the service and load existing model if available"""
@@ -27,25 +68,46 @@ class ModelTrainingService:
         await instance.load_model()
         return instance
     
-    async def train_recommendation_model(self) -> Dict:
+    async def train_recommendation_model(self, cf_engine: Optional[str] = None) -> Dict:
         """Train the main recommendation model using collaborative filtering"""
-        print("Starting model training...")
+        cf_engine = cf_engine or self.cf_engine
+        print(f"Starting model training with {cf_engine} engine...")
         
-        # Get training data
-        training_data = await self._prepare_training_data()
-        
-        if len(training_data) < 100:  # Minimum data requirement
-            print("Insufficient training data, using fallback model")
-            return await self._create_fallback_model()
+        training_started = time.perf_counter()
+        stage_seconds: Dict[str, float] = {}
+        streaming = create_factorizer(cf_engine).supports_streaming
         
-        # Create user-item interaction matrix
-        interaction_matrix = self._create_interaction_matrix(training_data)
-        
-        # Train collaborative filtering model
-        model_results = await self._train_collaborative_filtering(interaction_matrix)
+        # Get training data
+        self._report_progress('preparing_data', 0.0)
+        prepare = self._spill_training_data() if streaming else self._load_training_data()
+        training_set = await self._timed(stage_seconds, 'prepare_data', prepare)
         
-        # Train content-based features
-        content_model = await self._train_content_model(training_data)
+        try:
+            if training_set['data_size'] < 100:  # Minimum data requirement
+                print("Insufficient training data, using fallback model")
+                return await self._create_fallback_model()
+            
+            # CF training is CPU-bound and runs in a worker thread while content features are fetched
+            self._report_progress('training_models', 0.3)
+            if streaming:
+                collaborative = self._train_collaborative_streaming(training_set, cf_engine)
+            else:
+                collaborative = self._train_collaborative_filtering(training_set['interaction_matrix'], cf_engine)
+            
+            model_results, content_model = await asyncio.gather(
+                self._timed(stage_seconds, 'collaborative', collaborative),
+                self._timed(stage_seconds, 'content', self._train_content_model())
+            )
+            
+        finally:
+            if 'buckets' in training_set:
+                training_set['buckets'].cleanup()
+        
+        # Content neighbours are only read for catalog posts the CF model has no factors for
+        content_model['content_neighbors'] = await self._timed(
+            stage_seconds, 'content_neighbors',
+            asyncio.to_thread(self._content_neighbors, content_model, model_results['item_index'])
+        )
         
         # Combine models
         combined_model = {
@@ -53,148 +115,347 @@ class ModelTrainingService:
             'content': content_model,
             'metadata': {
                 'training_date': datetime.now().isoformat(),
-                'data_size': len(training_data),
-                'model_version': f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+                'data_size': model_results['training_stats'].get('interactions', training_set['data_size']),
+                'model_version': f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                'cf_training': model_results['training_stats'],
+                'stage_seconds': stage_seconds
             }
         }
         
         # Save model
-        await self._save_model(combined_model)
-        self.model = combined_model
-        self.model_version = combined_model['metadata']['model_version']
+        self._report_progress('saving', 0.9)
+        await self._save_model(combined_model, stage_seconds, training_started)
+        self.registry.install(combined_model, combined_model['metadata']['model_version'])
         
+        self._report_progress('completed', 1.0)
         print(f"Model training completed. Version: {self.model_version}")
         return combined_model
     
+    async def _timed(self, stage_seconds: Dict[str, float], stage: str, awaitable: Awaitable):
+        """Await one training stage and record its wall-clock time"""
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            stage_seconds[stage] = time.perf_counter() - started
+    
+    def _report_progress(self, stage: str, fraction: float):
+        if self.progress_callback:
+            self.progress_callback(stage, fraction)
+    
+    async def _load_training_data(self) -> Dict:
+        """Training data and interaction matrix held fully in memory"""
+        training_data = await self._prepare_training_data()
+        
+        if len(training_data) < 100:
+            return {'data_size': len(training_data)}
+        
+        # Create user-item interaction matrix
+        interaction_matrix = self._create_interaction_matrix(training_data)
+        
+        return {'data_size': len(training_data), 'interaction_matrix': interaction_matrix}
+    
     async def _prepare_training_data(self) -> pd.DataFrame:
         """Prepare training data from engagement history"""
-        # Get engagement data from last 30 days
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=30)
-        
-        engagement_data = await self.db.get_engagement_data(start_date, end_date)
+        now = datetime.now()
+        partials = [
+            partition async for partition in self._iter_training_partitions(self.window_days, now)
+            if len(partition)
+        ]
         
-        if not engagement_data:
+        if not partials:
             return pd.DataFrame()
         
-        df = pd.DataFrame(engagement_data)
+        # Merge partitions by user-post pair
+        user_post_scores = self._aggregate_user_post_scores(pd.concat(partials, ignore_index=True))
         
-        # Create engagement scores
-        engagement_weights = {
-            'VIEW': 1.0,
-            'LIKE': 3.0,
-            'COMMENT': 5.0,
-            'SHARE': 7.0
-        }
-        
-        df['engagement_score'] = df['engagement_type'].map(engagement_weights)
+        # Add time decay
+        return self._apply_time_decay(user_post_scores, now)
+    
+    async def _iter_training_partitions(self, window_days: int, now: datetime) -> AsyncIterator[pd.DataFrame]:
+        """Aggregated scores for each day of the window, oldest first, ending with today so far"""
+        today = now.date()
+        first_day = (now - timedelta(days=window_days)).date()
+        
+        # Closed days come from local partitions; only days never seen are fetched
+        fetched_days = 0
+        for offset in range((today - first_day).days):
+            day = first_day + timedelta(days=offset)
+            partition = self.snapshots.load_partition(day)
+            
+            if partition is None:
+                day_start = datetime.combine(day, datetime.min.time())
+                partition = await self._fetch_engagement_scores(
+                    day_start, day_start + timedelta(days=1) - timedelta(microseconds=1)
+                )
+                self.snapshots.save_partition(day, partition)
+                fetched_days += 1
+            
+            yield partition
         
-        # Aggregate by user-post pairs
-        user_post_scores = df.groupby(['user_id', 'post_id']).agg({
-            'engagement_score': 'sum',
-            'timestamp': 'max'
-        }).reset_index()
+        # Today is still filling up, so it is always read live and never persisted
+        yield await self._fetch_engagement_scores(datetime.combine(today, datetime.min.time()), now)
         
-        # Add time decay
-        now = datetime.now()
+        # Keep enough days for whichever mode looks back furthest
+        retention_days = max(self.window_days, self.streaming_window_days)
+        self.snapshots.prune((now - timedelta(days=retention_days)).date())
+        print(f"Training data: {fetched_days} day partitions fetched, {(today - first_day).days - fetched_days} reused")
+    
+    def _apply_time_decay(self, user_post_scores: pd.DataFrame, now: datetime) -> pd.DataFrame:
+        """Add final_score: the engagement score decayed by days since the last engagement"""
         user_post_scores['days_ago'] = (now - pd.to_datetime(user_post_scores['timestamp'])).dt.days
         user_post_scores['time_weight'] = np.exp(-user_post_scores['days_ago'] / 7)  # 7-day half-life
         user_post_scores['final_score'] = user_post_scores['engagement_score'] * user_post_scores['time_weight']
         
         return user_post_scores
     
-    def _create_interaction_matrix(self, training_data: pd.DataFrame) -> pd.DataFrame:
-        """Create user-item interaction matrix"""
-        interaction_matrix = training_data.pivot_table(
-            index='user_id',
-            columns='post_id',
-            values='final_score',
-            fill_value=0
+    async def fetch_engagement_scores(self, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+        """Time-decayed final_score per user-post pair for engagements between start_date and end_date"""
+        scores = await self._fetch_engagement_scores(start_date, end_date)
+        return self._apply_time_decay(scores, end_date) if len(scores) else scores
+    
+    async def _fetch_engagement_scores(self, start_date: datetime, end_date: datetime) -> pd.DataFrame:
+        """Weighted engagement score and last timestamp per user-post pair for one time range"""
+        # Aggregate each streamed chunk so peak memory stays bounded
+        partials = []
+        async for chunk in self.training_db.stream_engagement_columns(start_date, end_date):
+            chunk['engagement_score'] = chunk['engagement_type'].map(ENGAGEMENT_WEIGHTS).astype(np.float64)
+            partials.append(self._aggregate_user_post_scores(chunk))
+        
+        if not partials:
+            return empty_snapshot()
+        
+        return self._aggregate_user_post_scores(pd.concat(partials, ignore_index=True))
+    
+    def _aggregate_user_post_scores(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.groupby(['user_id', 'post_id'], observed=True, sort=False).agg({
+            'engagement_score': 'sum',
+            'timestamp': 'max'
+        }).reset_index()
+    
+    def _create_interaction_matrix(self, training_data: pd.DataFrame) -> Dict:
+        """Create sparse user-item interaction matrix"""
+        # Streamed ids arrive categorical; drop categories with no surviving interactions
+        users = training_data['user_id'].astype('category').cat.remove_unused_categories()
+        items = training_data['post_id'].astype('category').cat.remove_unused_categories()
+        
+        # Build CSR directly from categorical codes; memory scales with interactions
+        matrix = sparse.csr_matrix(
+            (
+                training_data['final_score'].to_numpy(dtype=np.float64),
+                (users.cat.codes.to_numpy(), items.cat.codes.to_numpy())
+            ),
+            shape=(len(users.cat.categories), len(items.cat.categories))
         )
         
-        return interaction_matrix
+        return {
+            'matrix': matrix,
+            'user_ids': users.cat.categories.tolist(),
+            'item_ids': items.cat.categories.tolist()
+        }
     
-    async def _train_collaborative_filtering(self, interaction_matrix: pd.DataFrame) -> Dict:
-        """Train collaborative filtering model using NMF"""
-        # Normalize the matrix
-        normalized_matrix = interaction_matrix.div(interaction_matrix.sum(axis=1), axis=0).fillna(0)
+    async def _train_collaborative_filtering(self, interaction_matrix: Dict, cf_engine: str = 'nmf') -> Dict:
+        """Train collaborative filtering model with the selected factorization engine"""
+        return await asyncio.to_thread(self._fit_collaborative_filtering, interaction_matrix, cf_engine)
+    
+    def _fit_collaborative_filtering(self, interaction_matrix: Dict, cf_engine: str) -> Dict:
+        matrix = interaction_matrix['matrix']
         
         # Determine number of factors
-        n_factors = min(50, min(interaction_matrix.shape) // 2)
+        n_factors = min(50, min(matrix.shape) // 2)
+        
+        # Factorize with the selected engine
+        factorizer = create_factorizer(cf_engine)
+        results = factorizer.fit(matrix, n_factors)
+        
+        print(f"CF training ({cf_engine}) took {results['stats']['wall_clock_seconds']:.2f}s")
+        
+        return self._build_collaborative_model(
+            results['user_factors'],
+            results['item_factors'],
+            interaction_matrix['user_ids'],
+            interaction_matrix['item_ids'],
+            n_factors,
+            results['stats'],
+            build_item_users(matrix)
+        )
+    
+    async def _spill_training_data(self) -> Dict:
+        """Spill the training window into user-hash buckets on disk, fixing the post vocabulary"""
+        now = datetime.now()
+        buckets = InteractionBuckets(self.model_dir, self.streaming_buckets)
         
-        # Train NMF model
-        nmf_model = NMF(n_components=n_factors, random_state=42, max_iter=200)
-        user_factors = nmf_model.fit_transform(normalized_matrix)
-        item_factors = nmf_model.components_
+        try:
+            user_ids = set()
+            item_ids = set()
+            spilled_rows = 0
+            async for partition in self._iter_training_partitions(self.streaming_window_days, now):
+                buckets.add(partition)
+                user_ids.update(partition['user_id'].astype(str).unique())
+                item_ids.update(partition['post_id'].astype(str).unique())
+                spilled_rows += len(partition)
+            
+        except Exception:
+            buckets.cleanup()
+            raise
         
-        # Store factors
-        self.user_factors = user_factors
-        self.item_factors = item_factors
+        return {
+            'data_size': spilled_rows,
+            'buckets': buckets,
+            'item_ids': sorted(item_ids),
+            'n_users': len(user_ids),
+            'now': now
+        }
+    
+    async def _train_collaborative_streaming(self, training_set: Dict, cf_engine: str) -> Dict:
+        """Train CF out of core, fitting one spilled bucket at a time"""
+        return await asyncio.to_thread(self._fit_collaborative_streaming, training_set, cf_engine)
+    
+    def _fit_collaborative_streaming(self, training_set: Dict, cf_engine: str) -> Dict:
+        factorizer = create_factorizer(cf_engine)
+        buckets = training_set['buckets']
+        now = training_set['now']
+        item_index = IdIndex(training_set['item_ids'])
+        n_factors = min(50, min(training_set['n_users'], len(item_index)) // 2)
+        
+        # Aggregate each bucket once; every epoch then reads a single sparse matrix per bucket
+        for bucket in buckets.buckets():
+            buckets.save_matrix(bucket, *self._bucket_matrix(buckets.read(bucket), item_index, factorizer, now))
+        
+        results = factorizer.fit_batches(
+            lambda: (buckets.load_matrix(bucket)[0] for bucket in buckets.buckets()),
+            n_factors
+        )
+        item_factors = results['item_factors']
+        
+        # User factors are solved bucket by bucket against the learned item factors
+        user_factor_blocks = []
+        bucket_matrices = []
+        bucket_user_ids = []
+        for bucket in buckets.buckets():
+            matrix, users = buckets.load_matrix(bucket)
+            user_factor_blocks.append(factorizer.fold_in(matrix, item_factors.T))
+            bucket_matrices.append(matrix)
+            bucket_user_ids.extend(users)
+        
+        stats = results['stats']
+        print(
+            f"CF training ({cf_engine}) took {stats['wall_clock_seconds']:.2f}s, "
+            f"{stats['interactions_per_second']:.0f} interactions/s"
+        )
         
-        # Calculate user and item similarities
-        user_similarity = cosine_similarity(user_factors)
-        item_similarity = cosine_similarity(item_factors.T)
+        return self._build_collaborative_model(
+            np.vstack(user_factor_blocks),
+            item_factors,
+            bucket_user_ids,
+            item_index.tolist(),
+            n_factors,
+            stats,
+            build_item_users(sparse.vstack(bucket_matrices, format='csr') if bucket_matrices
+                             else sparse.csr_matrix((0, len(item_index))))
+        )
+    
+    def _bucket_matrix(self, rows: pd.DataFrame, item_index: IdIndex, factorizer,
+                       now: datetime) -> Tuple[sparse.csr_matrix, List[str]]:
+        """Preprocessed user x item matrix and its user ids for one spilled bucket"""
+        scores = self._apply_time_decay(self._aggregate_user_post_scores(rows), now)
+        users = scores['user_id'].astype(str).astype('category')
+        item_rows, _ = item_index.lookup(scores['post_id'].astype(str))
+        
+        matrix = sparse.csr_matrix(
+            (scores['final_score'].to_numpy(dtype=np.float64), (users.cat.codes.to_numpy(), item_rows)),
+            shape=(len(users.cat.categories), len(item_index))
+        )
+        return factorizer.preprocess(matrix), users.cat.categories.tolist()
+    
+    def _build_collaborative_model(self, user_factors: np.ndarray, item_factors: np.ndarray, user_ids: List,
+                                   item_ids: List, n_factors: int, training_stats: Dict,
+                                   item_users: Dict[str, np.ndarray]) -> Dict:
+        # Keep only the nearest neighbours per user and item
+        user_neighbors = top_k_cosine_neighbors(user_factors, self.n_neighbors)
+        item_neighbors = top_k_cosine_neighbors(item_factors.T, self.n_neighbors)
         
         return {
-            'model': nmf_model,
             'user_factors': user_factors,
             'item_factors': item_factors,
-            'user_similarity': user_similarity,
-            'item_similarity': item_similarity,
-            'user_index': interaction_matrix.index.tolist(),
-            'item_index': interaction_matrix.columns.tolist(),
-            'n_factors': n_factors
+            'user_neighbors': user_neighbors,
+            'item_neighbors': item_neighbors,
+            # Inverted lists over item factors for candidate retrieval by user vector
+            'ann_index': build_ivf_index(item_factors.T),
+            # Post -> users posting lists for finding co-engaged users of a new user
+            'item_users': item_users,
+            'user_index': IdIndex(user_ids),
+            'item_index': IdIndex(item_ids),
+            'n_factors': n_factors,
+            'training_stats': training_stats
         }
     
-    async def _train_content_model(self, training_data: pd.DataFrame) -> Dict:
+    async def _train_content_model(self) -> Dict:
         """Train content-based model"""
-        # Get unique posts from training data
-        unique_posts = training_data['post_id'].unique()
-        
-        # Extract features for posts
-        post_features = []
-        for post_id in unique_posts[:1000]:  # Limit for performance
-            features = await self.feature_extractor.extract_post_features(post_id)
-            post_features.append(features)
+        # Featurize the whole catalog with set-based queries
+        feature_df = await self.feature_extractor.extract_catalog_post_features()
         
-        if not post_features:
-            return {'features': [], 'scaler': None}
+        if feature_df.empty:
+            return {'features': np.array([]), 'post_ids': [], 'post_index': IdIndex([]), 'content_neighbors': empty_neighbors()}
         
+        return await asyncio.to_thread(self._fit_content_model, feature_df)
+    
+    def _fit_content_model(self, feature_df: pd.DataFrame) -> Dict:
         # Create feature matrix
-        feature_df = pd.DataFrame(post_features)
         numeric_columns = feature_df.select_dtypes(include=[np.number]).columns
         feature_matrix = feature_df[numeric_columns].fillna(0)
         
         # Normalize features
         normalized_features = self.scaler.fit_transform(feature_matrix)
         
-        # Calculate content similarity
-        content_similarity = cosine_similarity(normalized_features)
-        
-        return {
+        content_model = {
             'features': normalized_features,
             'feature_columns': numeric_columns.tolist(),
             'post_ids': feature_df['post_id'].tolist(),
-            'scaler': self.scaler,
-            'content_similarity': content_similarity
+            'post_index': IdIndex(feature_df['post_id']),
+            'feature_mean': self.scaler.mean_,
+            'feature_scale': self.scaler.scale_,
+            'content_neighbors': empty_neighbors()
         }
+        
+        # Similar-post lookups for posts that were not in the catalog at training time
+        content_model['feature_index'] = build_content_index(content_model)
+        return content_model
+    
+    def _content_neighbors(self, content_model: Dict, item_index: IdIndex) -> Dict:
+        """Nearest posts with CF factors for each catalog post without them"""
+        post_ids = content_model['post_ids']
+        if not post_ids:
+            return empty_neighbors()
+        
+        known = np.fromiter((post_id in item_index for post_id in post_ids), dtype=bool, count=len(post_ids))
+        return top_k_cosine_neighbors(
+            content_model['features'],
+            self.n_neighbors,
+            query_rows=np.flatnonzero(~known),
+            candidate_rows=np.flatnonzero(known)
+        )
     
     async def _create_fallback_model(self) -> Dict:
         """Create a simple fallback model when insufficient data"""
         return {
             'collaborative': {
-                'model': None,
                 'user_factors': np.array([]),
                 'item_factors': np.array([]),
-                'user_similarity': np.array([]),
-                'item_similarity': np.array([]),
-                'user_index': [],
-                'item_index': [],
+                'user_neighbors': empty_neighbors(),
+                'item_neighbors': empty_neighbors(),
+                'ann_index': empty_ivf_index(),
+                'item_users': empty_item_users(),
+                'user_index': IdIndex([]),
+                'item_index': IdIndex([]),
                 'n_factors': 0
             },
             'content': {
-                'features': [],
-                'scaler': None
+                'features': np.array([]),
+                'post_ids': [],
+                'post_index': IdIndex([]),
+                'content_neighbors': empty_neighbors(),
+                'feature_index': None
             },
             'metadata': {
                 'training_date': datetime.now().isoformat(),
@@ -204,44 +465,26 @@ class ModelTrainingService:
             }
         }
     
-    async def _save_model(self, model: Dict):
-        """Save trained model to disk"""
-        model_path = f"models/recommendation_model_{model['metadata']['model_version']}.pkl"
+    async def _save_model(self, model: Dict, stage_seconds: Dict[str, float], training_started: float):
+        """Save trained model to disk, recording the save and total times in its metadata"""
+        save_started = time.perf_counter()
+        path = save_model_artifact(model, self.model_dir)
+        stage_seconds['save'] = time.perf_counter() - save_started
+        stage_seconds['total'] = time.perf_counter() - training_started
         
-        with open(model_path, 'wb') as f:
-            pickle.dump(model, f)
+        # The arrays had to be written before the save could be timed, so the manifest is rewritten
+        update_artifact_metadata(path, model['metadata'])
         
         # Save model metadata to database
         await self.db.save_model_metadata(model['metadata'])
     
     async def load_model(self) -> Optional[Dict]:
         """Load the latest trained model"""
-        try:
-            # Get latest model metadata
-            model_metadata = await self.db.get_latest_model_metadata()
-            
-            if not model_metadata:
-                print("No trained model found")
-                return None
-            
-            model_path = f"models/recommendation_model_{model_metadata['model_version']}.pkl"
-            
-            with open(model_path, 'rb') as f:
-                self.model = pickle.load(f)
-            
-            self.model_version = model_metadata['model_version']
-            
-            # Load factors for quick access
-            if self.model and 'collaborative' in self.model:
-                self.user_factors = self.model['collaborative']['user_factors']
-                self.item_factors = self.model['collaborative']['item_factors']
-            
-            print(f"Loaded model version: {self.model_version}")
-            return self.model
-            
-        except Exception as e:
-            print(f"Error loading model: {e}")
-            return None
+        return await self.registry.load_latest()
+    
+    async def load_model_version(self, model_version: str) -> Dict:
+        """Load a specific model version and swap it in for serving"""
+        return await self.registry.load_version(model_version)
     
     async def retrain_model(self) -> Dict:
         """Retrain the model with latest data"""
@@ -255,7 +498,7 @@ class ModelTrainingService:
         # Get test data (last 7 days)
         end_date = datetime.now()
         start_date = end_date - timedelta(days=7)
-        test_data = await self.db.get_engagement_data(start_date, end_date)
+        test_data = await self.analytics_db.get_engagement_data(start_date, end_date)
         
         if not test_data:
             return {'error': 'No test data available'}
@@ -295,7 +538,7 @@ class ModelTrainingService:
         
         return {
             'status': 'loaded',
-            'version': self.model_version,
+            **self.registry.get_info(),
             'metadata': self.model.get('metadata', {}),
             'collaborative_factors': self.model['collaborative']['n_factors'],
             'is_fallback': self.model['metadata'].get('is_fallback', False)
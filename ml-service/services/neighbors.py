@@ -0,0 +1,72 @@
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+# Upper bound on the similarity block held in memory at once (float32 cells)
+MAX_BLOCK_CELLS = 2 ** 24
+
+def top_k_cosine_neighbors(vectors: np.ndarray, k: int = 20, block_size: int = 1024,
+                           query_rows: Optional[np.ndarray] = None,
+                           candidate_rows: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Keep the k most cosine-similar rows for every row, computed block by block.
+
+    With query_rows only those rows get neighbours (the others are padded with -1), and with
+    candidate_rows neighbours are only drawn from those rows.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    n_rows = vectors.shape[0] if vectors.ndim == 2 else 0
+    query_rows = np.arange(n_rows) if query_rows is None else np.asarray(query_rows, dtype=np.int64)
+    candidate_rows = np.arange(n_rows) if candidate_rows is None else np.asarray(candidate_rows, dtype=np.int64)
+    all_candidates = len(candidate_rows) == n_rows
+    k = min(k, max(len(candidate_rows) - 1, 0) if all_candidates else len(candidate_rows))
+
+    indices = np.full((n_rows, k), -1, dtype=np.int32)
+    scores = np.zeros((n_rows, k), dtype=np.float32)
+
+    if len(query_rows) == 0 or k == 0:
+        return {'indices': indices, 'scores': scores}
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    normalized = vectors / np.maximum(norms, 1e-12)
+    candidates = normalized[candidate_rows]
+
+    # Position of every row among the candidates, so a row is never its own neighbour
+    candidate_position = np.full(n_rows, -1, dtype=np.int64)
+    candidate_position[candidate_rows] = np.arange(len(candidate_rows))
+
+    # Never materialize more than MAX_BLOCK_CELLS similarities at once
+    block_size = max(1, min(block_size, MAX_BLOCK_CELLS // len(candidate_rows)))
+
+    for start in range(0, len(query_rows), block_size):
+        block_rows = query_rows[start:start + block_size]
+        similarities = normalized[block_rows] @ candidates.T
+
+        own = candidate_position[block_rows]
+        similarities[np.flatnonzero(own >= 0), own[own >= 0]] = -np.inf
+
+        top = np.argpartition(similarities, -k, axis=1)[:, -k:]
+        top_scores = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        # Rows with fewer than k other candidates keep -1 padding
+        found = np.isfinite(top_scores)
+        indices[block_rows] = np.where(found, candidate_rows[top], -1)
+        scores[block_rows] = np.where(found, top_scores, 0.0)
+
+    return {'indices': indices, 'scores': scores}
+
+def get_neighbors(neighbors: Dict[str, np.ndarray], row: int, k: int = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Neighbour rows and cosine scores for one row, best first"""
+    indices = neighbors['indices']
+
+    if row is None or row >= len(indices):
+        return np.array([], dtype=np.int32), np.array([], dtype=np.float32)
+
+    rows, scores = indices[row, :k], neighbors['scores'][row, :k]
+    # Rows without a full set of neighbours are padded with -1
+    valid = rows >= 0
+    return rows[valid], scores[valid]
+
+def empty_neighbors() -> Dict[str, np.ndarray]:
+    return {'indices': np.zeros((0, 0), dtype=np.int32), 'scores': np.zeros((0, 0), dtype=np.float32)}
@@ -0,0 +1,48 @@
+import numpy as np
+from scipy import sparse
+from typing import Dict, Tuple
+
+# Users read per post when ranking overlap, so very popular posts cannot dominate a request's cost
+MAX_USERS_PER_POST = 1000
+
+def build_item_users(matrix: sparse.spmatrix) -> Dict[str, np.ndarray]:
+    """Post -> users posting lists (CSC layout) from a users x posts matrix, strongest engagement first"""
+    csc = sparse.csc_matrix(matrix)
+    csc.sum_duplicates()
+
+    # Re-order each column's users by descending engagement score
+    columns = np.repeat(np.arange(csc.shape[1]), np.diff(csc.indptr))
+    order = np.lexsort((-csc.data, columns))
+
+    return {
+        'indptr': csc.indptr.astype(np.int64),
+        'indices': csc.indices[order].astype(np.int32)
+    }
+
+def rank_users_by_overlap(item_users: Dict[str, np.ndarray], item_rows: np.ndarray, k: int = 10,
+                          max_users_per_post: int = MAX_USERS_PER_POST) -> Tuple[np.ndarray, np.ndarray]:
+    """User rows sharing the most posts with `item_rows`, with their overlap counts, best first"""
+    indptr = item_users['indptr']
+    indices = item_users['indices']
+
+    # Posts added after training have no posting list
+    item_rows = np.unique(np.asarray(item_rows, dtype=np.int64))
+    item_rows = item_rows[(item_rows >= 0) & (item_rows < len(indptr) - 1)]
+
+    if len(item_rows) == 0 or k <= 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    postings = [indices[indptr[row]:min(indptr[row + 1], indptr[row] + max_users_per_post)] for row in item_rows]
+    users, overlap = np.unique(np.concatenate(postings), return_counts=True)
+
+    if len(users) == 0:
+        return users.astype(np.int64), overlap
+
+    k = min(k, len(users))
+    top = np.argpartition(-overlap, k - 1)[:k]
+    top = top[np.argsort(-overlap[top], kind='stable')]
+
+    return users[top].astype(np.int64), overlap[top]
+
+def empty_item_users() -> Dict[str, np.ndarray]:
+    return {'indptr': np.zeros(1, dtype=np.int64), 'indices': np.zeros(0, dtype=np.int32)}
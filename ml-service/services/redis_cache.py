@@ -0,0 +1,164 @@
+import os
+import time
+import struct
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .model_registry import model_registry
+
+# Bump when a value layout below changes, so old entries are never decoded with a new layout
+CACHE_FORMAT_VERSION = 2
+
+# created_at, has_media, content_length; author id follows as UTF-8
+_POST = struct.Struct('<d?Q')
+# avg_engagement_per_post
+_AUTHOR = struct.Struct('<d')
+# has user_id, total_engagements, avg_session_duration, engagement_rate, content_diversity,
+# social_activity, recency_score; preferred hours follow as one byte each
+_USER = struct.Struct('<?Qddddd')
+
+def _encode_post(post: Dict) -> bytes:
+    return _POST.pack(
+        post['created_at'].timestamp(),
+        bool(post['has_media']),
+        int(post['content_length'])
+    ) + str(post['user_id']).encode()
+
+def _decode_post(post_id: str, data: bytes) -> Dict:
+    created_at, has_media, content_length = _POST.unpack_from(data)
+    return {
+        'user_id': data[_POST.size:].decode(),
+        'created_at': datetime.fromtimestamp(created_at),
+        'content_length': content_length,
+        'has_media': has_media
+    }
+
+def _encode_author(popularity: float) -> bytes:
+    return _AUTHOR.pack(float(popularity or 0))
+
+def _decode_author(author_id: str, data: bytes) -> float:
+    return _AUTHOR.unpack(data)[0]
+
+def _encode_user(features: Dict) -> bytes:
+    return _USER.pack(
+        'user_id' in features,
+        int(features['total_engagements']),
+        float(features['avg_session_duration']),
+        float(features['engagement_rate']),
+        float(features['content_diversity']),
+        float(features['social_activity']),
+        float(features['recency_score'])
+    ) + bytes(int(hour) for hour in features['preferred_hours'])
+
+def _decode_user(user_id: str, data: bytes) -> Dict:
+    has_user_id, total, duration, rate, diversity, social, recency = _USER.unpack_from(data)
+    features = {'user_id': user_id} if has_user_id else {}
+    features.update({
+        'total_engagements': total,
+        'avg_session_duration': duration,
+        'engagement_rate': rate,
+        'preferred_hours': list(data[_USER.size:]),
+        'content_diversity': diversity,
+        'social_activity': social,
+        'recency_score': recency
+    })
+    return features
+
+CODECS: Dict[str, Tuple[Callable[[Any], bytes], Callable[[str, bytes], Any]]] = {
+    'post': (_encode_post, _decode_post),
+    'author': (_encode_author, _decode_author),
+    'user': (_encode_user, _decode_user)
+}
+
+class RedisFeatureCache:
+    """Optional Redis tier behind the in-process FeatureCache, shared by every worker and replica"""
+
+    def __init__(self, url: Optional[str] = None, client=None, ttl_seconds: Optional[float] = None,
+                 version: Optional[Callable[[], Optional[str]]] = None):
+        self.url = url if url is not None else os.getenv('REDIS_URL')
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('FEATURE_CACHE_REDIS_TTL_SECONDS', '300'))
+        self.prefix = os.getenv('FEATURE_CACHE_REDIS_PREFIX', 'ml:features')
+        # After a Redis error the tier is skipped for this long instead of failing every lookup
+        self.retry_seconds = float(os.getenv('FEATURE_CACHE_REDIS_RETRY_SECONDS', '30'))
+        # Keys carry the serving model version, so a new model starts from a clean keyspace
+        self._version = version or (lambda: model_registry.model_version)
+        self._client = client
+        self._owns_client = client is None
+        self._skip_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._client is not None or bool(self.url)
+
+    def _get_client(self):
+        if self._client is None:
+            # Only needed when REDIS_URL is configured
+            import redis.asyncio as redis
+            self._client = redis.from_url(self.url)
+        return self._client
+
+    def _key(self, namespace: str, id_: str) -> str:
+        return f"{self.prefix}:{CACHE_FORMAT_VERSION}:{self._version() or 'none'}:{namespace}:{id_}"
+
+    def _available(self) -> bool:
+        return self.enabled and time.monotonic() >= self._skip_until
+
+    async def get_many(self, namespace: str, ids: List[str]) -> Dict[str, Any]:
+        """Decoded values for the ids found in Redis, in one MGET round trip"""
+        if not ids or not self._available():
+            return {}
+
+        decode = CODECS[namespace][1]
+        try:
+            raw_values = await self._get_client().mget([self._key(namespace, id_) for id_ in ids])
+        except Exception as e:
+            self._failed(e)
+            return {}
+
+        values = {id_: decode(id_, data) for id_, data in zip(ids, raw_values) if data is not None}
+        self.hits += len(values)
+        self.misses += len(ids) - len(values)
+        return values
+
+    async def set_many(self, namespace: str, values: Dict[str, Any]):
+        """Write values with the tier's TTL in one pipelined round trip"""
+        if not values or not self._available():
+            return
+
+        encode = CODECS[namespace][0]
+        try:
+            pipe = self._get_client().pipeline(transaction=False)
+            for id_, value in values.items():
+                pipe.set(self._key(namespace, id_), encode(value), ex=max(int(self.ttl_seconds), 1))
+            await pipe.execute()
+            self.writes += len(values)
+        except Exception as e:
+            self._failed(e)
+
+    def _failed(self, e: Exception):
+        self.errors += 1
+        self._skip_until = time.monotonic() + self.retry_seconds
+        print(f"Error using Redis feature cache: {e}")
+
+    async def close(self):
+        if self._client is not None and self._owns_client:
+            await self._client.aclose()
+            self._client = None
+
+    def get_info(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'writes': self.writes,
+            'errors': self.errors
+        }
+
+# Shared by every FeatureExtractionService in the process; a no-op unless REDIS_URL is set
+redis_feature_cache = RedisFeatureCache()
@@ -0,0 +1,139 @@
+import asyncio
+import multiprocessing
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+from .db_pool import pool_registry
+from .model_training import ModelTrainingService
+
+def _run_training_job(job_id: str, cf_engine: Optional[str], progress) -> Dict:
+    """Process-pool entry point: train a model and report progress through a shared dict"""
+
+    def report(stage: str, fraction: float):
+        progress[job_id] = {'stage': stage, 'fraction': fraction}
+
+    service = ModelTrainingService(cf_engine=cf_engine)
+    service.progress_callback = report
+
+    async def train() -> Dict:
+        try:
+            return await service.train_recommendation_model()
+        finally:
+            # The worker's pools are its own; close them before the event loop goes away
+            await pool_registry.close()
+
+    model = asyncio.run(train())
+    metadata = model['metadata']
+
+    return {
+        'model_version': metadata['model_version'],
+        'is_fallback': metadata.get('is_fallback', False),
+        'data_size': metadata['data_size']
+    }
+
+class TrainingExecutor:
+    """Runs model training in a worker process and hot-swaps the result into serving"""
+
+    def __init__(self, on_model_ready: Callable[[str], Awaitable], max_workers: int = 1):
+        self.on_model_ready = on_model_ready
+        self.max_workers = max_workers
+        self.jobs: Dict[str, Dict] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._manager = None
+        self._progress = None
+        self._tasks = set()
+
+    def _ensure_executor(self):
+        if self._executor is None:
+            # Spawn so workers don't inherit the serving process's event loop and pools
+            context = multiprocessing.get_context('spawn')
+            self._manager = context.Manager()
+            self._progress = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    def active_job(self) -> Optional[Dict]:
+        """The queued or running job, if any"""
+        for job in self.jobs.values():
+            if job['status'] in ('queued', 'running'):
+                return self.get_job(job['job_id'])
+        return None
+
+    def submit(self, cf_engine: Optional[str] = None) -> Dict:
+        """Start a training job unless one is already in flight"""
+        active = self.active_job()
+        if active:
+            return active
+
+        self._ensure_executor()
+
+        job_id = uuid.uuid4().hex
+        self.jobs[job_id] = {
+            'job_id': job_id,
+            'status': 'queued',
+            'engine': cf_engine,
+            'submitted_at': datetime.now().isoformat(),
+            'finished_at': None,
+            'model_version': None,
+            'error': None
+        }
+        self._progress[job_id] = {'stage': 'queued', 'fraction': 0.0}
+
+        future = asyncio.get_running_loop().run_in_executor(
+            self._executor, _run_training_job, job_id, cf_engine, self._progress
+        )
+        task = asyncio.ensure_future(self._watch(job_id, future))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        return self.get_job(job_id)
+
+    async def run_in_worker(self, fn: Callable, *args):
+        """Run another job, such as a fold-in, in the worker pool without listing it as a training job"""
+        self._ensure_executor()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _watch(self, job_id: str, future: asyncio.Future):
+        job = self.jobs[job_id]
+        job['status'] = 'running'
+
+        try:
+            result = await future
+            job['model_version'] = result['model_version']
+
+            # Fallback models are never persisted, so there is nothing to swap in
+            if not result['is_fallback']:
+                job['status'] = 'swapping'
+                await self.on_model_ready(result['model_version'])
+
+            job['status'] = 'completed'
+
+        except Exception as e:
+            print(f"Training job {job_id} failed: {e}")
+            job['status'] = 'failed'
+            job['error'] = str(e)
+
+        finally:
+            job['finished_at'] = datetime.now().isoformat()
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Job status merged with the worker's latest progress report"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return None
+
+        progress = dict(self._progress.get(job_id, {})) if self._progress is not None else {}
+        return {**job, 'progress': progress}
+
+    def list_jobs(self) -> List[Dict]:
+        return [self.get_job(job_id) for job_id in self.jobs]
+
+    def shutdown(self):
+        """Stop the worker pool and progress manager"""
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager:
+            self._manager.shutdown()
+            self._manager = None
+            self._progress = None
@@ -0,0 +1,152 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from datetime import date
+from scipy import sparse
+from typing import Dict, List, Optional, Tuple
+
+# Bump when the partition layout or the meaning of engagement_score changes
+SNAPSHOT_FORMAT_VERSION = 1
+
+def empty_snapshot() -> pd.DataFrame:
+    return pd.DataFrame({
+        'user_id': pd.Series([], dtype=object),
+        'post_id': pd.Series([], dtype=object),
+        'engagement_score': pd.Series([], dtype=np.float64),
+        'timestamp': pd.Series([], dtype='datetime64[ns]')
+    })
+
+def write_scores(path: str, scores: pd.DataFrame):
+    """Write aggregated scores with ids dictionary-encoded, atomically"""
+    users = pd.Categorical(scores['user_id'].astype(str))
+    posts = pd.Categorical(scores['post_id'].astype(str))
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, 'wb') as f:
+        np.savez(
+            f,
+            format_version=np.int32(SNAPSHOT_FORMAT_VERSION),
+            user_ids=np.asarray(users.categories, dtype=np.str_),
+            user_codes=users.codes.astype(np.int32),
+            post_ids=np.asarray(posts.categories, dtype=np.str_),
+            post_codes=posts.codes.astype(np.int32),
+            engagement_score=scores['engagement_score'].to_numpy(dtype=np.float32),
+            timestamp=scores['timestamp'].to_numpy(dtype='datetime64[ns]')
+        )
+
+    # Readers only ever see complete files
+    os.replace(tmp_path, path)
+
+def read_scores(path: str) -> Optional[pd.DataFrame]:
+    """Scores written by write_scores, or None if written by another format"""
+    with np.load(path, allow_pickle=False) as data:
+        if int(data['format_version']) != SNAPSHOT_FORMAT_VERSION:
+            return None
+
+        return pd.DataFrame({
+            'user_id': pd.Categorical.from_codes(data['user_codes'], categories=data['user_ids']),
+            'post_id': pd.Categorical.from_codes(data['post_codes'], categories=data['post_ids']),
+            'engagement_score': data['engagement_score'].astype(np.float64),
+            'timestamp': data['timestamp']
+        })
+
+class TrainingSnapshotStore:
+    """Daily partitions of pre-aggregated (user, post, weighted score, last timestamp) rows on local disk"""
+
+    def __init__(self, snapshot_dir: Optional[str] = None):
+        self.snapshot_dir = snapshot_dir or os.getenv(
+            'TRAINING_SNAPSHOT_DIR', os.path.join(os.getenv('MODEL_DIR', 'models'), 'training_snapshots')
+        )
+
+    def partition_path(self, day: date) -> str:
+        return os.path.join(self.snapshot_dir, f"engagement_{day.strftime('%Y%m%d')}.npz")
+
+    def list_days(self) -> List[date]:
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+
+        days = []
+        for name in os.listdir(self.snapshot_dir):
+            if name.startswith('engagement_') and name.endswith('.npz'):
+                try:
+                    days.append(pd.Timestamp(name[len('engagement_'):-len('.npz')]).date())
+                except ValueError:
+                    continue
+        return sorted(days)
+
+    def save_partition(self, day: date, scores: pd.DataFrame):
+        """Write one day's aggregated scores"""
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        write_scores(self.partition_path(day), scores)
+
+    def load_partition(self, day: date) -> Optional[pd.DataFrame]:
+        """One day's aggregated scores, or None if missing or written by another format"""
+        path = self.partition_path(day)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            return read_scores(path)
+
+        except Exception as e:
+            print(f"Error loading training snapshot {path}: {e}")
+            return None
+
+    def prune(self, oldest_day: date) -> int:
+        """Delete partitions that have fallen out of the training window"""
+        removed = 0
+        for day in self.list_days():
+            if day < oldest_day:
+                os.remove(self.partition_path(day))
+                removed += 1
+        return removed
+
+class InteractionBuckets:
+    """Temporary spill of aggregated scores partitioned by user hash, so each user's rows land in one bucket"""
+
+    def __init__(self, parent_dir: str, n_buckets: int = 64):
+        os.makedirs(parent_dir, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix='training_buckets_', dir=parent_dir)
+        self.n_buckets = n_buckets
+        self._files: Dict[int, List[str]] = {}
+
+    def add(self, scores: pd.DataFrame):
+        """Split a frame of scores across the buckets"""
+        if not len(scores):
+            return
+
+        user_ids = scores['user_id'].astype(str).to_numpy(dtype=object)
+        # hash_array is seeded with a fixed key, so buckets are stable across runs
+        buckets = pd.util.hash_array(user_ids) % np.uint64(self.n_buckets)
+
+        for bucket in np.unique(buckets):
+            files = self._files.setdefault(int(bucket), [])
+            path = os.path.join(self.directory, f"bucket_{int(bucket):04d}_{len(files):06d}.npz")
+            write_scores(path, scores[buckets == bucket])
+            files.append(path)
+
+    def buckets(self) -> List[int]:
+        return sorted(self._files)
+
+    def read(self, bucket: int) -> pd.DataFrame:
+        """Every row spilled into one bucket"""
+        frames = [read_scores(path) for path in self._files.get(bucket, [])]
+        if not frames:
+            return empty_snapshot()
+        return pd.concat(frames, ignore_index=True)
+
+    def save_matrix(self, bucket: int, matrix: sparse.csr_matrix, user_ids: List[str]):
+        """Keep a bucket's finished user x item matrix so later passes read one file"""
+        sparse.save_npz(os.path.join(self.directory, f"matrix_{bucket:04d}.npz"), matrix)
+        np.save(os.path.join(self.directory, f"matrix_{bucket:04d}_users.npy"), np.asarray(user_ids, dtype=np.str_))
+
+    def load_matrix(self, bucket: int) -> Tuple[sparse.csr_matrix, List[str]]:
+        matrix = sparse.load_npz(os.path.join(self.directory, f"matrix_{bucket:04d}.npz")).tocsr()
+        user_ids = np.load(os.path.join(self.directory, f"matrix_{bucket:04d}_users.npy")).tolist()
+        return matrix, user_ids
+
+    def cleanup(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._files = {}
@@ -0,0 +1,191 @@
+import os
+import time
+import heapq
+from datetime import datetime
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+from .database import DatabaseService, ENGAGEMENT_TYPES
+
+class SpaceSaving:
+    """Space-Saving heavy hitters: approximate counts for the most frequent of an unbounded set of keys"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[Hashable, float] = {}
+        # Overestimate inherited from the evicted key each entry replaced
+        self.errors: Dict[Hashable, float] = {}
+        # Lazy min-heap of (count, key); entries whose count has since changed are skipped
+        self._heap: List[Tuple[float, Hashable]] = []
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, key: Hashable, count: float = 1.0):
+        if key in self.counts:
+            self.counts[key] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0.0
+        else:
+            # The new key takes over the smallest counter, which bounds its overestimate
+            min_count, min_key = self._pop_min()
+            del self.counts[min_key]
+            del self.errors[min_key]
+            self.counts[key] = min_count + count
+            self.errors[key] = min_count
+
+        heapq.heappush(self._heap, (self.counts[key], key))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, key) for key, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> Tuple[float, Hashable]:
+        while True:
+            count, key = heapq.heappop(self._heap)
+            if self.counts.get(key) == count:
+                return count, key
+
+class TrendingDetector:
+    """Top posts by engagement over sliding time buckets, newer buckets weighted more, fed by engagement events.
+
+    Events come from the engagement table tail each worker runs, so every worker ranks the same stream.
+    """
+
+    def __init__(self, db: Optional[DatabaseService] = None, capacity: Optional[int] = None,
+                 bucket_seconds: Optional[int] = None, window_buckets: Optional[int] = None,
+                 half_life_seconds: Optional[float] = None):
+        self.db = db if db is not None else DatabaseService()
+        # Posts tracked per bucket; counts are exact for posts that stay above the bucket's smallest counter
+        self.capacity = capacity or int(os.getenv('TRENDING_CAPACITY', '1000'))
+        self.bucket_seconds = bucket_seconds or int(os.getenv('TRENDING_BUCKET_SECONDS', '3600'))
+        self.window_buckets = window_buckets or int(os.getenv('TRENDING_WINDOW_BUCKETS', '24'))
+        self.half_life_seconds = half_life_seconds or float(os.getenv('TRENDING_HALF_LIFE_SECONDS', '21600'))
+        self.refresh_seconds = float(os.getenv('TRENDING_REFRESH_SECONDS', '5'))
+        # Below this many events in the window the database query is used instead
+        self.min_events = int(os.getenv('TRENDING_MIN_EVENTS', '100'))
+        self._buckets: Dict[int, SpaceSaving] = {}
+        self._bucket_events: Dict[int, int] = {}
+        # Decayed totals of the closed buckets, recomputed only when the current bucket changes
+        self._closed_totals: Dict[Hashable, float] = {}
+        self._closed_as_of: Optional[int] = None
+        self._ranking: List[Hashable] = []
+        self._ranked_at = 0.0
+        self._dirty = False
+        # Last database fallback: when it was fetched, for what limit, and its posts
+        self._fallback: Optional[Tuple[float, int, List[str]]] = None
+        self.through: Optional[datetime] = None
+        self.events_ingested = 0
+        self.fallbacks = 0
+
+    def ingest(self, events: Iterable[Dict], through: Optional[datetime] = None) -> int:
+        """Count engagement events into their time buckets, returning how many were counted.
+
+        `through` marks that every engagement up to that time has now been ingested.
+        """
+        now = time.time()
+        current_bucket = int(now // self.bucket_seconds)
+        counted = 0
+
+        for event in events:
+            if event.get('engagement_type') not in ENGAGEMENT_TYPES or not event.get('post_id'):
+                continue
+
+            timestamp = event.get('timestamp')
+            bucket = int(timestamp.timestamp() // self.bucket_seconds) if isinstance(timestamp, datetime) else current_bucket
+            # Clock skew must not open buckets ahead of now
+            bucket = min(bucket, current_bucket)
+
+            if bucket <= current_bucket - self.window_buckets:
+                continue
+
+            self._buckets.setdefault(bucket, SpaceSaving(self.capacity)).add(str(event['post_id']))
+            self._bucket_events[bucket] = self._bucket_events.get(bucket, 0) + 1
+            # Late events land in a closed bucket, whose totals must then be rebuilt
+            if bucket < current_bucket:
+                self._closed_as_of = None
+            counted += 1
+
+        if counted:
+            self._dirty = True
+        if through is not None:
+            self.through = through
+        self.events_ingested += counted
+        return counted
+
+    def is_warm(self) -> bool:
+        self._expire_buckets(int(time.time() // self.bucket_seconds))
+        return sum(self._bucket_events.values()) >= self.min_events
+
+    def top(self, limit: int) -> List[str]:
+        """Current top posts, re-ranked at most every refresh_seconds"""
+        now = time.time()
+
+        if (self._dirty and now - self._ranked_at >= self.refresh_seconds) or self._closed_as_of != int(now // self.bucket_seconds):
+            self._rank(now)
+
+        return self._ranking[:limit]
+
+    async def get_trending_posts(self, limit: int = 50) -> List[str]:
+        """Trending posts from ingested events, or from the database until enough events were seen"""
+        if self.is_warm():
+            return self.top(limit)
+
+        # The fallback query is a GROUP BY over a day of engagements, so its result is reused like a ranking
+        now = time.time()
+        if self._fallback is not None:
+            fetched_at, fetched_limit, posts = self._fallback
+            if now - fetched_at < self.refresh_seconds and limit <= fetched_limit:
+                return posts[:limit]
+
+        self.fallbacks += 1
+        posts = await self.db.get_trending_posts(limit=limit)
+        self._fallback = (now, limit, posts)
+        return posts
+
+    def _rank(self, now: float):
+        current_bucket = int(now // self.bucket_seconds)
+        self._expire_buckets(current_bucket)
+
+        if self._closed_as_of != current_bucket:
+            self._closed_totals = {}
+            for bucket, summary in self._buckets.items():
+                if bucket < current_bucket:
+                    weight = self._weight(current_bucket - bucket)
+                    for post_id, count in summary.counts.items():
+                        self._closed_totals[post_id] = self._closed_totals.get(post_id, 0.0) + weight * count
+            self._closed_as_of = current_bucket
+
+        totals = dict(self._closed_totals)
+        current = self._buckets.get(current_bucket)
+        if current is not None:
+            for post_id, count in current.counts.items():
+                totals[post_id] = totals.get(post_id, 0.0) + count
+
+        self._ranking = heapq.nlargest(self.capacity, totals, key=totals.get)
+        self._ranked_at = now
+        self._dirty = False
+
+    def _weight(self, age_buckets: int) -> float:
+        return 0.5 ** (age_buckets * self.bucket_seconds / self.half_life_seconds)
+
+    def _expire_buckets(self, current_bucket: int):
+        for bucket in [b for b in self._buckets if b <= current_bucket - self.window_buckets]:
+            del self._buckets[bucket]
+            del self._bucket_events[bucket]
+            self._closed_as_of = None
+
+    def get_info(self) -> Dict:
+        return {
+            'warm': self.is_warm(),
+            'window_events': sum(self._bucket_events.values()),
+            'buckets': len(self._buckets),
+            'capacity': self.capacity,
+            'bucket_seconds': self.bucket_seconds,
+            'window_buckets': self.window_buckets,
+            'half_life_seconds': self.half_life_seconds,
+            'events_ingested': self.events_ingested,
+            'ingested_through': self.through.isoformat() if self.through else None,
+            'database_fallbacks': self.fallbacks
+        }
+
+# Fed by the engagement table tail and read by candidate generation
+trending_detector = TrendingDetector()
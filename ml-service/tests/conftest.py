@@ -0,0 +1,54 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# ml-service is not an importable package name, so tests import `services` from its directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ann_index import build_ivf_index
+from services.id_index import IdIndex
+from services.neighbors import top_k_cosine_neighbors
+
+@pytest.fixture
+def make_model():
+    """Build a small trained-model dict in the layout save_model_artifact expects"""
+
+    def make(n_users: int = 30, n_items: int = 50, n_factors: int = 4, n_content_posts: int = 60,
+             model_version: str = 'v_test', seed: int = 0):
+        rng = np.random.default_rng(seed)
+        user_factors = rng.normal(size=(n_users, n_factors))
+        item_factors = rng.normal(size=(n_factors, n_items))
+        item_ids = [f'p{i}' for i in range(n_items)]
+
+        raw_features = rng.normal(loc=5.0, scale=2.0, size=(n_content_posts, 3))
+        feature_mean = raw_features.mean(axis=0)
+        feature_scale = raw_features.std(axis=0)
+
+        return {
+            'collaborative': {
+                'user_factors': user_factors,
+                'item_factors': item_factors,
+                'user_neighbors': top_k_cosine_neighbors(user_factors, 5),
+                'item_neighbors': top_k_cosine_neighbors(item_factors.T, 5),
+                'ann_index': build_ivf_index(item_factors.T),
+                'user_index': IdIndex(f'u{i}' for i in range(n_users)),
+                'item_index': IdIndex(item_ids),
+                'n_factors': n_factors
+            },
+            'content': {
+                'features': (raw_features - feature_mean) / feature_scale,
+                'feature_columns': ['content_length', 'has_media', 'hour_of_day'],
+                'post_ids': [f'p{i}' for i in range(n_content_posts)],
+                'post_index': IdIndex(f'p{i}' for i in range(n_content_posts)),
+                'feature_mean': feature_mean,
+                'feature_scale': feature_scale
+            },
+            'metadata': {
+                'model_version': model_version,
+                'training_date': '2026-10-01T12:00:00',
+                'data_size': n_users * n_items
+            }
+        }
+
+    return make
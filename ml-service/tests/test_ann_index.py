@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from services.ann_index import add_to_ivf_index, build_ivf_index, empty_ivf_index, search_ivf_index
+
+@pytest.fixture
+def vectors():
+    # Clustered item vectors, as trained factors tend to be
+    rng = np.random.default_rng(0)
+    centers = rng.normal(scale=3.0, size=(20, 16))
+    return (centers[rng.integers(0, 20, size=4000)] + rng.normal(size=(4000, 16))).astype(np.float32)
+
+def true_top_k(vectors, query, k):
+    return set(np.argsort(-(vectors @ query))[:k].tolist())
+
+def test_recall_against_brute_force(vectors):
+    index = build_ivf_index(vectors)
+    queries = np.random.default_rng(1).normal(scale=3.0, size=(50, 16)).astype(np.float32)
+    k = 50
+
+    recalls = []
+    for query in queries:
+        rows, scores = search_ivf_index(index, vectors, query, k, n_probe=8)
+        assert len(rows) == k
+        assert np.all(np.diff(scores) <= 0)
+        np.testing.assert_allclose(scores, vectors[rows] @ query, rtol=1e-5)
+        recalls.append(len(true_top_k(vectors, query, k) & set(rows.tolist())) / k)
+
+    assert np.mean(recalls) >= 0.9
+
+def test_probing_every_list_is_exact(vectors):
+    index = build_ivf_index(vectors, n_lists=16)
+    query = vectors[7]
+
+    rows, _ = search_ivf_index(index, vectors, query, 30, n_probe=16)
+
+    assert set(rows.tolist()) == true_top_k(vectors, query, 30)
+    # Every row is filed in exactly one list
+    assert sorted(index['list_rows'].tolist()) == list(range(len(vectors)))
+
+def test_added_rows_are_retrievable(vectors):
+    index = build_ivf_index(vectors[:3000])
+    extended = add_to_ivf_index(index, vectors[3000:], first_row=3000)
+
+    assert sorted(extended['list_rows'].tolist()) == list(range(len(vectors)))
+    np.testing.assert_array_equal(extended['centroids'], index['centroids'])
+
+    query = vectors[3500]
+    expected = true_top_k(vectors, query, 20)
+    assert any(row >= 3000 for row in expected)
+    rows, _ = search_ivf_index(extended, vectors, query, 20, n_probe=len(extended['centroids']))
+    assert set(rows.tolist()) == expected
+
+def test_empty_index_returns_nothing(vectors):
+    rows, scores = search_ivf_index(empty_ivf_index(), vectors, vectors[0], 10)
+    assert len(rows) == 0 and len(scores) == 0
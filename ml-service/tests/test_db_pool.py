@@ -0,0 +1,71 @@
+import os
+import asyncio
+import pytest
+from services.db_pool import PoolManager, PoolRegistry, WORKLOAD_DEFAULTS
+
+# Two databases on a local server, e.g. postgresql://postgres@localhost/ml_test_a and .../ml_test_b
+SERVING_DSN = os.getenv('TEST_DATABASE_URL')
+TRAINING_DSN = os.getenv('TEST_DATABASE_URL_TRAINING')
+
+POOL_ENV = [
+    f"{name}{suffix}"
+    for name in ('DATABASE_URL', 'DB_POOL_MIN_SIZE', 'DB_POOL_MAX_SIZE', 'DB_STATEMENT_TIMEOUT_MS', 'DB_STATEMENT_CACHE_SIZE')
+    for suffix in ['', *[f"_{workload.upper()}" for workload in WORKLOAD_DEFAULTS]]
+]
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for name in POOL_ENV:
+        monkeypatch.delenv(name, raising=False)
+
+def test_tuned_settings_ignore_shared_value(monkeypatch):
+    monkeypatch.setenv('DB_POOL_MAX_SIZE', '50')
+    monkeypatch.setenv('DB_STATEMENT_TIMEOUT_MS', '1000')
+    monkeypatch.setenv('DB_POOL_MAX_SIZE_TRAINING', '6')
+
+    serving = PoolManager('serving')
+    training = PoolManager('training')
+
+    assert serving.max_size == 10
+    assert serving.statement_timeout_ms == 30000
+    assert training.max_size == 6
+    assert training.statement_timeout_ms == 0
+
+def test_shared_settings_fall_back_to_unsuffixed_value(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://primary/social_live')
+    monkeypatch.setenv('DATABASE_URL_TRAINING', 'postgresql://replica/social_live')
+    monkeypatch.setenv('DB_STATEMENT_CACHE_SIZE', '64')
+
+    assert PoolManager('serving').db_url == 'postgresql://primary/social_live'
+    assert PoolManager('analytics').db_url == 'postgresql://primary/social_live'
+    assert PoolManager('training').db_url == 'postgresql://replica/social_live'
+    assert PoolManager('training').statement_cache_size == 64
+
+@pytest.mark.skipif(not (SERVING_DSN and TRAINING_DSN),
+                    reason="set TEST_DATABASE_URL and TEST_DATABASE_URL_TRAINING to two local databases")
+def test_workloads_connect_to_their_own_database(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', SERVING_DSN)
+    monkeypatch.setenv('DATABASE_URL_TRAINING', TRAINING_DSN)
+    monkeypatch.setenv('DB_STATEMENT_TIMEOUT_MS', '1000')
+
+    async def run():
+        registry = PoolRegistry()
+        try:
+            settings = {}
+            for workload in ('serving', 'training', 'analytics'):
+                async with registry.get(workload).query('test_settings') as conn:
+                    settings[workload] = await conn.fetchrow(
+                        "SELECT current_database() AS database, current_setting('statement_timeout') AS timeout"
+                    )
+            return settings, registry.get_metrics()
+        finally:
+            await registry.close()
+
+    settings, metrics = asyncio.run(run())
+
+    assert settings['serving']['database'] == settings['analytics']['database']
+    assert settings['serving']['database'] != settings['training']['database']
+    assert settings['serving']['timeout'] == '30s'
+    assert settings['training']['timeout'] == '0'
+    assert settings['analytics']['timeout'] == '5min'
+    assert metrics['training']['queries']['test_settings']['count'] == 1
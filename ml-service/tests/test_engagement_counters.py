@@ -0,0 +1,162 @@
+import types
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from services import engagement_counters as engagement_counters_module
+from services.engagement_counters import EngagementCounters
+from services.engagement_tail import EngagementTail
+from services.feature_cache import FeatureCache
+from services.feature_extraction import FeatureExtractionService
+from services.redis_cache import RedisFeatureCache
+
+class FakeDb:
+    """user_engagement rows in memory, with the queries the counters and the tail make"""
+
+    def __init__(self):
+        self.rows = []
+        self.fetch_started = None
+        self.release_fetch = None
+
+    def add(self, post_id, engagement_type, timestamp):
+        self.rows.append({
+            'user_id': 'u1',
+            'post_id': post_id,
+            'engagement_type': engagement_type,
+            'timestamp': timestamp,
+            'duration': 1.0
+        })
+
+    async def get_posts_engagement_data(self, post_ids, until=None):
+        if self.release_fetch is not None:
+            self.fetch_started.set()
+            await self.release_fetch.wait()
+
+        counts = {}
+        for post_id in post_ids:
+            rows = [row for row in self.rows if row['post_id'] == post_id and (until is None or row['timestamp'] <= until)]
+            counts[post_id] = {
+                name: sum(row['engagement_type'] == engagement_type for row in rows)
+                for name, engagement_type in (('views', 'VIEW'), ('likes', 'LIKE'), ('comments', 'COMMENT'), ('shares', 'SHARE'))
+            }
+        return counts
+
+    async def get_posts_data(self, post_ids):
+        created_at = datetime.now() - timedelta(hours=10)
+        return {post_id: {'id': post_id, 'user_id': 'a1', 'content': 'hello', 'image_url': None, 'created_at': created_at}
+                for post_id in post_ids}
+
+    async def get_authors_stats(self, author_ids):
+        return {author_id: {'avg_engagement_per_post': 2.0} for author_id in author_ids}
+
+    async def get_engagements_between(self, after, until):
+        return sorted((row for row in self.rows if after < row['timestamp'] <= until), key=lambda row: row['timestamp'])
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(engagement_counters_module, 'time', types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+def like(post_id, timestamp):
+    return {'post_id': post_id, 'engagement_type': 'LIKE', 'timestamp': timestamp}
+
+def test_tail_feeds_rows_written_after_the_cursor():
+    db = FakeDb()
+    counters = EngagementCounters(db=db)
+    tail = EngagementTail([counters], db=db, lag=0)
+    db.add('p1', 'LIKE', datetime.now() - timedelta(hours=1))
+
+    async def run():
+        await tail.poll()
+        seeded = await counters.load_counts(['p1'])
+        db.add('p1', 'LIKE', datetime.now())
+        db.add('p1', 'VIEW', datetime.now())
+        await asyncio.sleep(0.01)
+        await tail.poll()
+        return seeded, counters.get_counts(['p1'])
+
+    seeded, counts = asyncio.run(run())
+
+    assert seeded['p1']['likes'] == 1
+    assert counts['p1']['likes'] == 2
+    assert counts['p1']['views'] == 1
+    assert tail.events_read == 2
+    assert counters.is_tail_current()
+
+def test_reconcile_keeps_events_ingested_during_the_fetch():
+    db = FakeDb()
+    counters = EngagementCounters(db=db)
+    through = datetime(2026, 10, 1, 12, 0)
+    db.add('p1', 'LIKE', through - timedelta(minutes=5))
+    counters.ingest([], through=through)
+
+    async def run():
+        await counters.load_counts(['p1'])
+        db.fetch_started = asyncio.Event()
+        db.release_fetch = asyncio.Event()
+
+        reconcile = asyncio.create_task(counters.reconcile())
+        await db.fetch_started.wait()
+        # Written and tailed while the database query is running
+        later = through + timedelta(seconds=1)
+        db.add('p1', 'LIKE', later)
+        counters.ingest([like('p1', later)], through=later)
+        db.release_fetch.set()
+        await reconcile
+        return counters.get_counts(['p1'])
+
+    counts = asyncio.run(run())
+
+    # Counted once: by the fetch up to its cutoff, and by the tail after it
+    assert counts['p1']['likes'] == 2
+    assert counters.last_reconcile['status'] == 'completed'
+
+def test_reconcile_picks_up_rows_the_tail_skipped():
+    db = FakeDb()
+    counters = EngagementCounters(db=db)
+    through = datetime(2026, 10, 1, 12, 0)
+    counters.ingest([], through=through)
+
+    asyncio.run(counters.load_counts(['p1']))
+    # Committed late, with a timestamp behind the tail cursor
+    db.add('p1', 'LIKE', through - timedelta(seconds=1))
+    assert counters.get_counts(['p1'])['p1']['likes'] == 0
+
+    asyncio.run(counters.reconcile())
+    assert counters.get_counts(['p1'])['p1']['likes'] == 1
+
+def test_counts_expire_after_ttl_without_a_current_tail(clock):
+    db = FakeDb()
+    counters = EngagementCounters(db=db)
+    counters.ttl_seconds = 60
+    counters.max_tail_delay = 30
+
+    db.add('p1', 'LIKE', datetime(2026, 10, 1, 12, 0))
+    assert asyncio.run(counters.load_counts(['p1']))['p1']['likes'] == 1
+
+    clock[0] += 59
+    assert 'p1' in counters.get_counts(['p1'])
+    clock[0] += 2
+    assert counters.get_counts(['p1']) == {}
+
+    # A current tail keeps them served
+    counters.ingest([], through=datetime(2026, 10, 1, 12, 1))
+    assert 'p1' in counters.get_counts(['p1'])
+    clock[0] += 31
+    assert counters.get_counts(['p1']) == {}
+
+    db.add('p1', 'LIKE', datetime(2026, 10, 1, 12, 0))
+    assert asyncio.run(counters.load_counts(['p1']))['p1']['likes'] == 2
+
+def test_velocity_is_counted_engagements_per_hour_of_age(monkeypatch):
+    monkeypatch.delenv('REDIS_URL', raising=False)
+    db = FakeDb()
+    counters = EngagementCounters(db=db)
+    extractor = FeatureExtractionService(db=db, cache=FeatureCache(), shared_cache=RedisFeatureCache(), counters=counters)
+    for engagement_type in ('VIEW', 'VIEW', 'LIKE', 'SHARE', 'VIEW'):
+        db.add('p1', engagement_type, datetime.now() - timedelta(hours=1))
+
+    features = asyncio.run(extractor.extract_posts_features(['p1']))['p1']
+
+    assert features['total_views'] == 3
+    assert features['engagement_velocity'] == pytest.approx(5 / 10, rel=1e-3)
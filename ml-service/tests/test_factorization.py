@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from services.factorization import ImplicitALSFactorizer, create_factorizer
+
+N_USERS, N_ITEMS, N_FACTORS = 60, 40, 4
+
+@pytest.fixture
+def matrix():
+    # Two taste groups, each engaging mostly with its own half of the items
+    rng = np.random.default_rng(0)
+    groups = np.arange(N_USERS) % 2
+    probability = np.where(groups[:, None] == (np.arange(N_ITEMS) % 2)[None, :], 0.4, 0.03)
+    engaged = rng.random((N_USERS, N_ITEMS)) < probability
+    return sparse.csr_matrix(engaged * rng.integers(1, 4, size=engaged.shape).astype(np.float64))
+
+def dense_solve(factorizer, matrix, fixed):
+    """Per-row closed form x = (Y^T C Y + reg I)^-1 Y^T C p"""
+    dense = matrix.toarray()
+    out = np.zeros((dense.shape[0], fixed.shape[1]))
+    for row, values in enumerate(dense):
+        confidence = 1.0 + factorizer.alpha * values
+        preference = (values > 0).astype(np.float64)
+        lhs = fixed.T @ (confidence[:, None] * fixed) + factorizer.regularization * np.eye(fixed.shape[1])
+        out[row] = np.linalg.solve(lhs, fixed.T @ (confidence * preference))
+    return out
+
+def loss(factorizer, matrix, user_factors, item_factors):
+    dense = matrix.toarray()
+    confidence = 1.0 + factorizer.alpha * dense
+    error = (dense > 0) - user_factors @ item_factors
+    penalty = factorizer.regularization * (np.sum(user_factors ** 2) + np.sum(item_factors ** 2))
+    return float(np.sum(confidence * error ** 2) + penalty)
+
+def test_solve_matches_closed_form_across_blocks_and_chunks(matrix):
+    # Tiny blocks and chunks so rows straddle both
+    factorizer = ImplicitALSFactorizer(n_threads=2, block_rows=7, chunk_bytes=5 * N_FACTORS * N_FACTORS * 8)
+    fixed = np.random.default_rng(1).normal(size=(N_ITEMS, N_FACTORS))
+
+    folded = factorizer.fold_in(matrix, fixed)
+
+    assert folded.shape == (N_USERS, N_FACTORS)
+    np.testing.assert_allclose(folded, dense_solve(factorizer, matrix, fixed), rtol=1e-8, atol=1e-10)
+
+def test_fit_converges_and_returns_serving_shapes(matrix):
+    losses = []
+    for iterations in (1, 2, 5, 10):
+        factorizer = create_factorizer('als', iterations=iterations, n_threads=2, block_rows=16)
+        results = factorizer.fit(matrix, N_FACTORS)
+        losses.append(loss(factorizer, matrix, results['user_factors'], results['item_factors']))
+
+    # Every half-step is an exact least-squares solve, so the objective never goes up
+    assert all(later <= earlier + 1e-9 for earlier, later in zip(losses, losses[1:]))
+    assert losses[-1] < losses[0]
+
+    # Serving reads user rows and item columns
+    assert results['user_factors'].shape == (N_USERS, N_FACTORS)
+    assert results['item_factors'].shape == (N_FACTORS, N_ITEMS)
+    assert results['stats']['iterations'] == 10
+    assert len(results['stats']['iteration_seconds']) == 10
+    assert results['stats']['interactions'] == matrix.nnz
+
+    # Observed interactions outscore unobserved ones
+    scores = results['user_factors'] @ results['item_factors']
+    observed = matrix.toarray() > 0
+    assert scores[observed].mean() > scores[~observed].mean() + 0.3
+
+def test_fit_batches_drops_user_factors(matrix):
+    factorizer = create_factorizer('als', iterations=2, n_threads=1)
+    results = factorizer.fit_batches(lambda: [matrix[:30], matrix[30:]], N_FACTORS)
+
+    assert 'user_factors' not in results
+    assert results['item_factors'].shape == (N_FACTORS, N_ITEMS)
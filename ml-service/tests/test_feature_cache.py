@@ -0,0 +1,63 @@
+import types
+import pytest
+from services import feature_cache as feature_cache_module
+from services.feature_cache import FeatureCache, _estimate_size
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(feature_cache_module, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+def entry_size(key, value) -> int:
+    return _estimate_size(key) + _estimate_size(value)
+
+def test_evicts_least_recently_used_over_budget(clock):
+    value = {'views': 1, 'likes': 2}
+    cache = FeatureCache(max_bytes=3 * entry_size(('post', 'p1'), value), ttl_seconds=60)
+
+    for post_id in ('p1', 'p2', 'p3'):
+        cache.set(('post', post_id), value)
+    # Reading p1 makes p2 the least recently used
+    assert cache.get(('post', 'p1')) == value
+    cache.set(('post', 'p4'), value)
+
+    assert ('post', 'p2') not in cache.get_many([('post', post_id) for post_id in ('p1', 'p2', 'p3', 'p4')])
+    assert len(cache) == 3
+    assert cache.size_bytes <= cache.max_bytes
+    assert cache.get_info()['evictions'] == 1
+
+def test_skips_values_larger_than_budget(clock):
+    cache = FeatureCache(max_bytes=200, ttl_seconds=60)
+    cache.set('small', 1)
+    cache.set('large', list(range(100)))
+
+    assert cache.get('large') is None
+    assert cache.get('small') == 1
+
+def test_entries_expire_after_ttl(clock):
+    cache = FeatureCache(max_bytes=10_000, ttl_seconds=60)
+    cache.set('default_ttl', 1)
+    cache.set('short_ttl', 2, ttl_seconds=5)
+
+    clock[0] += 10
+    assert cache.get('short_ttl') is None
+    assert cache.get('default_ttl') == 1
+
+    clock[0] += 60
+    assert cache.get('default_ttl') is None
+
+    info = cache.get_info()
+    assert info['expirations'] == 2
+    assert info['entries'] == 0
+    assert info['size_bytes'] == 0
+
+def test_overwrite_and_invalidate_keep_size_accounting(clock):
+    cache = FeatureCache(max_bytes=10_000, ttl_seconds=60)
+    cache.set('key', [1, 2, 3])
+    cache.set('key', [1])
+    assert cache.size_bytes == entry_size('key', [1])
+
+    cache.invalidate('key')
+    assert cache.size_bytes == 0
+    assert cache.get('key') is None
@@ -0,0 +1,93 @@
+import asyncio
+import numpy as np
+import pandas as pd
+import pytest
+from services import fold_in as fold_in_module
+from services.factor_blocks import StackedFactors
+from services.fold_in import build_fold_in, publish_fold_in
+from services.id_index import ExtendedIdIndex, IdIndex
+from services.model_store import (
+    apply_fold_in, artifact_path, fold_in_path, load_fold_in_artifact, load_model_artifact,
+    read_fold_in_manifest, save_model_artifact
+)
+
+def new_engagements():
+    # unew engages with known posts; pnew is engaged with by known users and by unew
+    rows = [('unew', 'p1', 3.0), ('unew', 'p2', 5.0), ('unew', 'pnew', 1.0)]
+    rows += [(f'u{i}', 'pnew', 3.0) for i in range(4)]
+    return pd.DataFrame(rows, columns=['user_id', 'post_id', 'final_score'])
+
+@pytest.fixture
+def saved_model(make_model, tmp_path):
+    model = make_model()
+    model['metadata']['cf_training'] = {'engine': 'als'}
+    save_model_artifact(model, str(tmp_path))
+    return model, str(tmp_path)
+
+def test_stacked_factors_read_base_then_delta():
+    base = np.arange(12, dtype=np.float32).reshape(4, 3)
+    delta = np.full((2, 3), -1.0, dtype=np.float32)
+    stacked = StackedFactors(base, delta)
+
+    assert stacked.shape == (6, 3)
+    np.testing.assert_array_equal(stacked[1], base[1])
+    np.testing.assert_array_equal(stacked[-1], delta[1])
+    np.testing.assert_array_equal(stacked[[0, 4, 3, 5]], np.vstack([base[0], delta[0], base[3], delta[1]]))
+    np.testing.assert_array_equal(stacked[2:5], np.vstack([base[2:], delta[:1]]))
+    np.testing.assert_array_equal(stacked.T[:, [5, 0]], np.vstack([delta[1], base[0]]).T)
+    np.testing.assert_array_equal(np.asarray(stacked), np.vstack([base, delta]))
+
+def test_extended_id_index_continues_after_the_base():
+    index = ExtendedIdIndex(IdIndex(['a', 'b', 'c']), ['d', 'b', 'e'])
+
+    assert len(index) == 5
+    assert [index.get(id_) for id_ in 'abcde'] == [0, 1, 2, 3, 4]
+    assert list(index) == ['a', 'b', 'c', 'd', 'e']
+    rows, missing = index.lookup(['e', 'a', 'x'])
+    assert rows.tolist()[:2] == [4, 0]
+    assert missing.tolist() == [False, False, True]
+
+def test_published_fold_in_resolves_new_rows_and_keeps_base_rows(saved_model, monkeypatch):
+    model, model_dir = saved_model
+    version = model['metadata']['model_version']
+
+    async def fetch_engagement_scores(self, start_date, end_date):
+        return new_engagements()
+
+    monkeypatch.setattr(fold_in_module.ModelTrainingService, 'fetch_engagement_scores', fetch_engagement_scores)
+    result = asyncio.run(publish_fold_in(model_dir, version, max_window_hours=24 * 365 * 10))
+
+    assert (result['status'], result['users'], result['items']) == ('completed', 1, 1)
+    assert read_fold_in_manifest(model_dir, version)['revision'] == 1
+
+    base = load_model_artifact(artifact_path(model_dir, version))
+    fold_in = load_fold_in_artifact(fold_in_path(model_dir, version))
+    served = apply_fold_in(base, fold_in)['collaborative']
+
+    # New IDs land right after the base rows and read the folded-in factors
+    user_row = served['user_index'].get('unew')
+    item_row = served['item_index'].get('pnew')
+    assert (user_row, item_row) == (30, 50)
+    np.testing.assert_array_equal(served['user_factors'][user_row], fold_in['user_factors'][0])
+    np.testing.assert_array_equal(served['item_factors'][:, [item_row]][:, 0], fold_in['item_factors'][0])
+    assert served['user_factors'].dtype == np.float32
+
+    # Base rows are the memory-mapped base, unchanged
+    for user_id in ('u0', 'u29'):
+        row = served['user_index'].get(user_id)
+        np.testing.assert_array_equal(served['user_factors'][row], base['collaborative']['user_factors'][row])
+        np.testing.assert_allclose(served['user_factors'][row], model['collaborative']['user_factors'][row], rtol=1e-6)
+    assert isinstance(served['user_factors'].base, np.memmap)
+
+    # pnew is retrievable through the ANN lists
+    assert item_row in served['ann_index']['list_rows']
+
+def test_nothing_new_publishes_nothing(saved_model):
+    model, model_dir = saved_model
+    base = load_model_artifact(artifact_path(model_dir, model['metadata']['model_version']))
+
+    known = pd.DataFrame([('u1', 'p1', 1.0)], columns=['user_id', 'post_id', 'final_score'])
+    fold_in, stats = build_fold_in(base, known)
+
+    assert fold_in is None
+    assert stats == {'engagements': 1, 'users': 0, 'items': 0}
@@ -0,0 +1,184 @@
+import json
+import os
+import pickle
+import asyncio
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+from services.inference import InferenceService
+from services.model_registry import ModelRegistry
+from services.model_store import (
+    MANIFEST_FILE, artifact_path, legacy_pickle_path, load_legacy_pickle, load_model_artifact, save_model_artifact,
+    update_artifact_metadata
+)
+
+def test_update_artifact_metadata_rewrites_only_the_manifest(make_model, tmp_path):
+    model = make_model()
+    model['metadata']['stage_seconds'] = {'collaborative': 1.5}
+    path = save_model_artifact(model, str(tmp_path))
+    arrays_before = {name: os.path.getmtime(os.path.join(path, name)) for name in os.listdir(path) if name.endswith('.npy')}
+
+    model['metadata']['stage_seconds'].update({'save': 0.25, 'total': 2.0})
+    update_artifact_metadata(path, model['metadata'])
+
+    assert load_model_artifact(path)['metadata']['stage_seconds'] == {'collaborative': 1.5, 'save': 0.25, 'total': 2.0}
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        assert 'user_factors' in json.load(f)['arrays']
+    assert {name: os.path.getmtime(os.path.join(path, name)) for name in arrays_before} == arrays_before
+    assert sorted(os.listdir(path)) == sorted(list(arrays_before) + [MANIFEST_FILE])
+
+def write_v1_artifact(model, model_dir) -> str:
+    """The format 1 layout: dense similarity matrices and no ANN index or posting lists"""
+    collaborative = model['collaborative']
+    content = model['content']
+    path = artifact_path(str(model_dir), model['metadata']['model_version'])
+    os.makedirs(path)
+
+    user_factors = np.asarray(collaborative['user_factors'], dtype=np.float32)
+    item_factors = np.asarray(collaborative['item_factors'], dtype=np.float32).T
+    arrays = {
+        'user_factors': user_factors,
+        'item_factors': item_factors,
+        'user_similarity': user_factors @ user_factors.T,
+        'item_similarity': item_factors @ item_factors.T,
+        'user_ids': np.asarray(collaborative['user_index'].tolist(), dtype=np.str_),
+        'item_ids': np.asarray(collaborative['item_index'].tolist(), dtype=np.str_),
+        'content_features': np.asarray(content['features'], dtype=np.float32),
+        'content_post_ids': np.asarray(content['post_ids'], dtype=np.str_),
+        'content_similarity': np.zeros((0,), dtype=np.float32),
+        'feature_mean': np.asarray(content['feature_mean'], dtype=np.float32),
+        'feature_scale': np.asarray(content['feature_scale'], dtype=np.float32)
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array, allow_pickle=False)
+
+    with open(os.path.join(path, MANIFEST_FILE), 'w') as f:
+        json.dump({
+            'format_version': 1,
+            'metadata': model['metadata'],
+            'collaborative': {'n_factors': collaborative['n_factors']},
+            'content': {'feature_columns': content['feature_columns']},
+            'arrays': {name: list(array.shape) for name, array in arrays.items()}
+        }, f)
+    return path
+
+def serving(model) -> InferenceService:
+    registry = ModelRegistry()
+    registry.install(model, model['metadata']['model_version'])
+    return InferenceService(registry=registry)
+
+def test_saved_model_serves_the_same_after_mmap_load(make_model, tmp_path):
+    model = make_model()
+    loaded = load_model_artifact(save_model_artifact(model, str(tmp_path)))
+    collaborative = loaded['collaborative']
+
+    assert isinstance(collaborative['user_factors'], np.memmap)
+    assert collaborative['user_factors'].dtype == np.float32
+    assert collaborative['item_factors'].shape == model['collaborative']['item_factors'].shape
+    assert collaborative['item_index'].tolist() == model['collaborative']['item_index'].tolist()
+    for name in ('user_neighbors', 'item_neighbors'):
+        np.testing.assert_array_equal(collaborative[name]['indices'], model['collaborative'][name]['indices'])
+    for name in ('centroids', 'list_offsets', 'list_rows'):
+        np.testing.assert_array_equal(collaborative['ann_index'][name], model['collaborative']['ann_index'][name])
+
+    original, reloaded = serving(model), serving(loaded)
+    rows = np.arange(len(collaborative['item_index']))
+    for user_id in ('u0', 'u7', 'u29'):
+        user_row = collaborative['user_index'].get(user_id)
+        np.testing.assert_allclose(
+            reloaded._score_items(collaborative['user_factors'][[user_row]], collaborative, rows),
+            original._score_items(model['collaborative']['user_factors'][[user_row]], model['collaborative'], rows),
+            rtol=1e-5
+        )
+        assert reloaded._retrieve_candidate_posts(user_id, 10) == original._retrieve_candidate_posts(user_id, 10)
+
+    # Cold posts are matched through the content index built on load
+    assert loaded['content']['feature_index'].query({'content_length': 5.0, 'has_media': 5.0, 'hour_of_day': 5.0}, k=3)
+
+def test_format_1_artifact_loads_without_neighbour_lists(make_model, tmp_path):
+    model = make_model()
+    loaded = load_model_artifact(write_v1_artifact(model, tmp_path))
+    collaborative = loaded['collaborative']
+
+    assert collaborative['user_neighbors']['indices'].size == 0
+    assert collaborative['ann_index']['centroids'].size == 0
+    assert collaborative['item_users'] is None
+    np.testing.assert_allclose(collaborative['user_factors'], model['collaborative']['user_factors'], rtol=1e-6)
+    np.testing.assert_allclose(collaborative['item_factors'], model['collaborative']['item_factors'], rtol=1e-6)
+
+    # Scores match a format 2 save of the same model; ANN retrieval is simply unavailable
+    v2 = load_model_artifact(save_model_artifact(model, str(tmp_path / 'v2')))['collaborative']
+    service = serving(loaded)
+    rows = np.arange(len(collaborative['item_index']))
+    np.testing.assert_array_equal(
+        service._score_items(collaborative['user_factors'][[3]], collaborative, rows),
+        service._score_items(v2['user_factors'][[3]], v2, rows)
+    )
+    assert service._retrieve_candidate_posts('u3', 10) == []
+
+def test_unknown_format_is_rejected(make_model, tmp_path):
+    path = save_model_artifact(make_model(), str(tmp_path))
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    with open(manifest_path, 'w') as f:
+        json.dump({**manifest, 'format_version': 99}, f)
+
+    with pytest.raises(ValueError):
+        load_model_artifact(path)
+
+def write_legacy_pickle(model, model_dir, with_scaler: bool = True) -> str:
+    """The pre-artifact layout: the whole model dict pickled, with a fitted StandardScaler"""
+    content = model['content']
+    raw_features = content['features'] * content['feature_scale'] + content['feature_mean']
+    scaler = StandardScaler().fit(raw_features) if with_scaler else None
+
+    legacy = {
+        'collaborative': {
+            'model': None,
+            'user_factors': model['collaborative']['user_factors'],
+            'item_factors': model['collaborative']['item_factors'],
+            'user_index': model['collaborative']['user_index'].tolist(),
+            'item_index': model['collaborative']['item_index'].tolist(),
+            'n_factors': model['collaborative']['n_factors']
+        },
+        'content': {
+            'features': scaler.transform(raw_features) if with_scaler else content['features'],
+            'feature_columns': content['feature_columns'],
+            'post_ids': content['post_ids'],
+            'scaler': scaler,
+            'content_similarity': np.zeros((0,))
+        },
+        'metadata': model['metadata']
+    }
+
+    path = legacy_pickle_path(str(model_dir), model['metadata']['model_version'])
+    with open(path, 'wb') as f:
+        pickle.dump(legacy, f)
+    return path
+
+def test_legacy_pickle_is_served(make_model, tmp_path):
+    model = make_model(model_version='v_legacy')
+    write_legacy_pickle(model, tmp_path)
+    registry = ModelRegistry(model_dir=str(tmp_path))
+
+    loaded = asyncio.run(registry.load_version('v_legacy'))
+
+    assert registry.model_version == 'v_legacy'
+    assert 'u3' in loaded['collaborative']['user_index']
+    feature_index = loaded['content']['feature_index']
+    np.testing.assert_allclose(feature_index.feature_mean, model['content']['feature_mean'])
+    np.testing.assert_allclose(feature_index.feature_scale, model['content']['feature_scale'])
+
+    # A catalog post's raw features find that post first
+    raw = model['content']['features'][4] * model['content']['feature_scale'] + model['content']['feature_mean']
+    assert feature_index.query(dict(zip(model['content']['feature_columns'], raw)), k=1) == ['p4']
+
+def test_legacy_pickle_without_scaler_skips_content_index(make_model, tmp_path):
+    model = make_model(model_version='v_legacy')
+    path = write_legacy_pickle(model, tmp_path, with_scaler=False)
+
+    loaded = load_legacy_pickle(path)
+
+    assert loaded['content']['feature_index'] is None
+    assert loaded['collaborative']['item_index'].get('p2') == 2
@@ -0,0 +1,125 @@
+import types
+import asyncio
+import pytest
+from datetime import datetime
+from services import redis_cache as redis_cache_module
+from services.redis_cache import CODECS, RedisFeatureCache
+
+POST = {
+    'user_id': 'author-1',
+    'created_at': datetime(2026, 10, 1, 12, 30, 15),
+    'content_length': 140,
+    'has_media': True
+}
+USER = {
+    'user_id': 'u1',
+    'total_engagements': 42,
+    'avg_session_duration': 12.5,
+    'engagement_rate': 0.25,
+    'preferred_hours': [8, 12, 21],
+    'content_diversity': 0.6,
+    'social_activity': 0.1,
+    'recency_score': 0.9
+}
+
+class RecordingClient:
+    """Wraps a Redis client and counts the round trips the cache makes"""
+
+    def __init__(self, client):
+        self.client = client
+        self.mget_calls = 0
+        self.pipelines = []
+
+    async def mget(self, keys):
+        self.mget_calls += 1
+        return await self.client.mget(keys)
+
+    def pipeline(self, transaction=True):
+        pipe = self.client.pipeline(transaction=transaction)
+        self.pipelines.append(transaction)
+        return pipe
+
+class FailingClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def mget(self, keys):
+        self.calls += 1
+        raise ConnectionError("redis is down")
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(redis_cache_module, 'time', types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+@pytest.mark.parametrize('namespace, value', [
+    ('post', POST),
+    ('author', 3.75),
+    ('user', USER),
+    ('user', {key: value for key, value in USER.items() if key != 'user_id'})
+])
+def test_codec_round_trip(namespace, value):
+    encode, decode = CODECS[namespace]
+    assert decode('u1', encode(value)) == value
+
+def test_get_many_and_set_many_use_one_round_trip_each():
+    fakeredis = pytest.importorskip('fakeredis')
+    client = RecordingClient(fakeredis.FakeAsyncRedis())
+    cache = RedisFeatureCache(client=client, ttl_seconds=30, version=lambda: 'v1')
+
+    async def run():
+        await cache.set_many('author', {'a1': 1.5, 'a2': 2.5})
+        values = await cache.get_many('author', ['a1', 'a2', 'a3'])
+        ttl = await client.client.ttl(cache._key('author', 'a1'))
+        return values, ttl
+
+    values, ttl = asyncio.run(run())
+
+    assert values == {'a1': 1.5, 'a2': 2.5}
+    assert 0 < ttl <= 30
+    assert client.mget_calls == 1
+    assert client.pipelines == [False]
+    assert (cache.hits, cache.misses, cache.writes) == (2, 1, 2)
+
+def test_keys_are_scoped_to_model_version():
+    fakeredis = pytest.importorskip('fakeredis')
+    client = fakeredis.FakeAsyncRedis()
+    version = ['v1']
+    cache = RedisFeatureCache(client=client, ttl_seconds=30, version=lambda: version[0])
+
+    async def run():
+        await cache.set_many('post', {'p1': POST})
+        before = await cache.get_many('post', ['p1'])
+        version[0] = 'v2'
+        after = await cache.get_many('post', ['p1'])
+        return before, after
+
+    before, after = asyncio.run(run())
+
+    assert before == {'p1': POST}
+    assert after == {}
+
+def test_errors_bypass_redis_until_retry_window_passes(clock):
+    client = FailingClient()
+    cache = RedisFeatureCache(client=client, ttl_seconds=30, version=lambda: 'v1')
+    cache.retry_seconds = 30
+
+    assert asyncio.run(cache.get_many('author', ['a1'])) == {}
+    assert (client.calls, cache.errors) == (1, 1)
+
+    # Inside the window the tier is skipped without touching the client
+    clock[0] += 29
+    assert asyncio.run(cache.get_many('author', ['a1'])) == {}
+    assert client.calls == 1
+
+    clock[0] += 2
+    assert asyncio.run(cache.get_many('author', ['a1'])) == {}
+    assert (client.calls, cache.errors) == (2, 2)
+
+def test_disabled_without_url_or_client(monkeypatch):
+    monkeypatch.delenv('REDIS_URL', raising=False)
+    cache = RedisFeatureCache()
+
+    assert not cache.enabled
+    assert asyncio.run(cache.get_many('author', ['a1'])) == {}
@@ -0,0 +1,52 @@
+import types
+import asyncio
+import pytest
+from datetime import datetime
+from services import trending as trending_module
+from services.trending import TrendingDetector
+
+class FakeDb:
+    def __init__(self):
+        self.calls = 0
+
+    async def get_trending_posts(self, limit=50):
+        self.calls += 1
+        return [f'db{i}' for i in range(limit)]
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [datetime(2026, 10, 1, 12, 30).timestamp()]
+    monkeypatch.setattr(trending_module, 'time', types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+def like(post_id):
+    return {'post_id': post_id, 'engagement_type': 'LIKE', 'timestamp': datetime(2026, 10, 1, 12, 15)}
+
+def test_database_fallback_is_reused_for_refresh_seconds(clock):
+    db = FakeDb()
+    detector = TrendingDetector(db=db)
+    detector.refresh_seconds = 5
+
+    assert asyncio.run(detector.get_trending_posts(limit=10)) == [f'db{i}' for i in range(10)]
+    assert asyncio.run(detector.get_trending_posts(limit=4)) == [f'db{i}' for i in range(4)]
+    assert db.calls == 1
+
+    # A larger limit than was fetched needs a new query
+    asyncio.run(detector.get_trending_posts(limit=20))
+    assert db.calls == 2
+
+    clock[0] += 6
+    asyncio.run(detector.get_trending_posts(limit=10))
+    assert (db.calls, detector.fallbacks) == (3, 3)
+
+def test_tailed_events_warm_the_detector(clock):
+    db = FakeDb()
+    detector = TrendingDetector(db=db)
+    detector.min_events = 5
+
+    detector.ingest([like('p1')] * 3 + [like('p2')] * 2, through=datetime(2026, 10, 1, 12, 29))
+
+    assert detector.is_warm()
+    assert asyncio.run(detector.get_trending_posts(limit=2)) == ['p1', 'p2']
+    assert db.calls == 0
+    assert detector.get_info()['ingested_through'] == '2026-10-01T12:29:00'